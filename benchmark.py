@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+
+# Attention: Do not import the ev3dev.ev3 module in this file
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from typing import List, Tuple, Dict, Optional
+
+import pathfinding
+from planet import Planet
+from planet_generator import generate_planet
+
+
+def random_queries(planet: Planet, count: int, seed: int = 0) -> List[Tuple[Tuple[int, int], Tuple[int, int]]]:
+    """
+        :return: List of count random (start, target) pairs of nodes of planet
+        """
+    rng = random.Random(seed)
+    nodes = list(planet.get_paths())
+    return [(rng.choice(nodes), rng.choice(nodes)) for _ in range(count)]
+
+
+def path_weight(planet: Planet, path) -> int:
+    paths = planet.get_paths()
+    return sum(paths[node][direction][2] for node, direction in path)
+
+
+def benchmark_contraction(sizes: List[int], queries: int, seed: int = 0):
+    """
+        Prints the build time of the contraction hierarchy and the mean query latency of the 'ch' engine
+        against plain heap Dijkstra for generated planets of the given sizes.
+        """
+    print(f'{"nodes":>8} {"build s":>9} {"shortcuts":>10} {"dijkstra ms":>12} {"ch ms":>8} {"speedup":>8}')
+    for size in sizes:
+        planet = generate_planet(size, seed).to_planet(cache_paths=False)
+        pairs = random_queries(planet, queries, seed)
+
+        start_time = time.perf_counter()
+        hierarchy = planet.contraction_hierarchy()
+        build_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        expected = [pathfinding.dijkstra(planet.get_traversable_paths(), start, target) for start, target in pairs]
+        dijkstra_time = (time.perf_counter() - start_time) / queries
+
+        start_time = time.perf_counter()
+        results = [planet.shortest_path(start, target, engine='ch') for start, target in pairs]
+        ch_time = (time.perf_counter() - start_time) / queries
+
+        for path, reference in zip(results, expected):
+            if (path is None) != (reference is None) or \
+                    (path is not None and path_weight(planet, path) != path_weight(planet, reference)):
+                raise AssertionError(f'contraction hierarchy disagrees with dijkstra on {len(planet.get_paths())} nodes')
+
+        print(f'{len(planet.get_paths()):>8} {build_time:>9.2f} {hierarchy.shortcuts:>10} {dijkstra_time * 1000:>12.3f} '
+              f'{ch_time * 1000:>8.3f} {dijkstra_time / ch_time:>8.1f}')
+
+
+def benchmark_dynamic(sizes: List[int], batches: int, batch_size: int, trees: int = 8, seed: int = 0):
+    """
+        Prints how long repairing the cached trees of a dynamic_paths planet after each batch of path changes
+        (new, re-weighted and blocked paths inside Planet.batch()) takes against building them again.
+        Every repaired tree is checked against a fresh one.
+        """
+    print(f'{"nodes":>8} {"batches":>8} {"repair ms":>10} {"rebuild ms":>11} {"speedup":>8}')
+    for size in sizes:
+        generated = generate_planet(size, seed)
+        rng = random.Random(seed)
+        held_back = list(generated.paths)
+        rng.shuffle(held_back)
+        known = held_back[:len(held_back) * 4 // 5]
+        held_back = held_back[len(known):]
+        planet = Planet(dynamic_paths=True)
+        for start, target, weight in known:
+            planet.add_path(start, target, weight)
+        starts = rng.sample(list(planet.get_paths()), min(trees, len(planet.get_paths())))
+        for start in starts:
+            planet.shortest_path_tree(start)
+        repair_time = rebuild_time = 0.0
+        for _ in range(batches):
+            changes = []
+            for _ in range(batch_size):
+                if held_back and rng.random() < 0.5:
+                    changes.append(held_back.pop())
+                else:
+                    start, target, _ = rng.choice(known)
+                    changes.append((start, target, -1 if rng.random() < 0.2 else rng.randint(1, 30)))
+            misses = planet.path_cache_misses
+            start_time = time.perf_counter()
+            with planet.batch():
+                for start, target, weight in changes:
+                    planet.add_path(start, target, weight)
+            repaired = [planet.shortest_path_tree(start) for start in starts]
+            repair_time += time.perf_counter() - start_time
+            if planet.path_cache_misses != misses:
+                raise AssertionError(f'a batch dropped a dynamic shortest path tree on {size} nodes')
+
+            start_time = time.perf_counter()
+            fresh = [pathfinding.DynamicShortestPathTree(planet.get_traversable_paths(), start) for start in starts]
+            rebuild_time += time.perf_counter() - start_time
+            for tree, reference in zip(repaired, fresh):
+                if any(tree.distance(node) != reference.distance(node) for node in planet.get_paths()):
+                    raise AssertionError(f'repaired shortest path tree differs from a fresh one on {size} nodes')
+
+        print(f'{len(planet.get_paths()):>8} {batches:>8} {repair_time * 1000:>10.2f} {rebuild_time * 1000:>11.2f} '
+              f'{rebuild_time / repair_time:>8.1f}')
+
+
+def _result(benchmark: str, nodes: int, calls: int, seconds: float) -> Dict:
+    return {'benchmark': benchmark, 'nodes': nodes, 'calls': calls, 'seconds': seconds,
+            'us_per_call': seconds / calls * 1e6}
+
+
+def benchmark_suite(sizes: List[int], queries: int, engines: List[str], seed: int = 0) -> List[Dict]:
+    """
+        Times the main Planet operations on generated planets of the given sizes. The engines are timed without
+        the path cache, shortest_path[heap, cached] times the default Planet as main.py uses it.
+        :param sizes: List of node counts
+        :param queries: Integer, calls per search benchmark
+        :param engines: List of Planet.PATH_ENGINES to time shortest_path with
+        :param seed: Integer, seed of the planets and the queries
+        :return: List of result Dicts (benchmark, nodes, calls, seconds, us_per_call)
+        """
+    results = []
+    for size in sizes:
+        generated = generate_planet(size, seed)
+
+        planet = Planet()
+        start_time = time.perf_counter()
+        for start, target, weight in generated.paths:
+            planet.add_path(start, target, weight)
+        results.append(_result('add_path', size, len(generated.paths), time.perf_counter() - start_time))
+
+        pairs = random_queries(planet, queries, seed)
+        for engine in engines:
+            planet = generated.to_planet(path_engine=engine, cache_paths=False)
+            if engine == 'ch':
+                planet.contraction_hierarchy()
+            start_time = time.perf_counter()
+            for start, target in pairs:
+                planet.shortest_path(start, target)
+            results.append(_result(f'shortest_path[{engine}]', size, queries, time.perf_counter() - start_time))
+
+        # the configuration of main.py: heap engine answering from the cached shortest path trees
+        planet = generated.to_planet()
+        start_time = time.perf_counter()
+        for start, target in pairs:
+            planet.shortest_path(start, target)
+        results.append(_result('shortest_path[heap, cached]', size, queries, time.perf_counter() - start_time))
+
+        planet = generated.partial_planet(0.5, cache_paths=False)
+        rng = random.Random(seed)
+        starts = [rng.choice(list(planet.visited_nodes)) for _ in range(queries)]
+        start_time = time.perf_counter()
+        for start in starts:
+            planet.shortest_unexplored_path(start)
+        results.append(_result('shortest_unexplored_path', size, queries, time.perf_counter() - start_time))
+
+        start_time = time.perf_counter()
+        for start in starts:
+            planet.next_unexplored_node_and_direction(start)
+        results.append(_result('next_unexplored_node_and_direction', size, queries,
+                               time.perf_counter() - start_time))
+    return results
+
+
+def metadata(seed: int) -> Dict:
+    """
+        :return: Dict describing the run: commit (if inside a git checkout), python version, machine, time and seed
+        """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'machine': platform.machine(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'seed': seed}
+
+
+def compare(old: Dict, new: Dict, threshold: float) -> bool:
+    """
+        Prints the results of two suite runs side by side.
+        :param old: Dict, JSON output of an earlier run
+        :param new: Dict, JSON output of a later run
+        :param threshold: Float, relative slowdown which counts as regression
+        :return: bool, True if no benchmark got slower by more than threshold
+        """
+    old_results = {(result['benchmark'], result['nodes']): result for result in old['results']}
+    print(f'{"benchmark":<40} {"nodes":>8} {"old us":>12} {"new us":>12} {"ratio":>7}')
+    ok = True
+    for result in new['results']:
+        key = (result['benchmark'], result['nodes'])
+        if key not in old_results:
+            continue
+        ratio = result['us_per_call'] / old_results[key]['us_per_call']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  slower'
+            ok = False
+        elif ratio < 1 - threshold:
+            flag = '  faster'
+        print(f'{key[0]:<40} {key[1]:>8} {old_results[key]["us_per_call"]:>12.1f} {result["us_per_call"]:>12.1f} '
+              f'{ratio:>7.2f}{flag}')
+    return ok
+
+
+def main(arguments: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmarks of planet.py on generated planets')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    suite = commands.add_parser('suite', help='time the main Planet operations and write the results as JSON')
+    suite.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000, 100000])
+    suite.add_argument('--queries', type=int, default=20)
+    suite.add_argument('--engines', nargs='+', default=['heap', 'astar', 'bidirectional'], choices=Planet.PATH_ENGINES)
+    suite.add_argument('--seed', type=int, default=0)
+    suite.add_argument('--output', help='JSON file, default standard output')
+
+    comparison = commands.add_parser('compare', help='compare two JSON files written by suite')
+    comparison.add_argument('old')
+    comparison.add_argument('new')
+    comparison.add_argument('--threshold', type=float, default=0.1)
+
+    contraction = commands.add_parser('contraction', help='contraction hierarchy against plain Dijkstra')
+    contraction.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    contraction.add_argument('--queries', type=int, default=100)
+    contraction.add_argument('--seed', type=int, default=0)
+
+    dynamic = commands.add_parser('dynamic', help='repairs of dynamic shortest path trees after batches of changes')
+    dynamic.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    dynamic.add_argument('--batches', type=int, default=50)
+    dynamic.add_argument('--batch-size', type=int, default=4)
+    dynamic.add_argument('--seed', type=int, default=0)
+
+    args = parser.parse_args(arguments)
+    if args.command == 'suite':
+        report = {'meta': metadata(args.seed),
+                  'results': benchmark_suite(args.sizes, args.queries, args.engines, args.seed)}
+        if args.output:
+            with open(args.output, 'w') as file:
+                json.dump(report, file, indent=2)
+        else:
+            json.dump(report, sys.stdout, indent=2)
+            print()
+    elif args.command == 'compare':
+        with open(args.old) as old_file, open(args.new) as new_file:
+            return 0 if compare(json.load(old_file), json.load(new_file), args.threshold) else 1
+    elif args.command == 'dynamic':
+        benchmark_dynamic(args.sizes, args.batches, args.batch_size, seed=args.seed)
+    else:
+        benchmark_contraction(args.sizes, args.queries, args.seed)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
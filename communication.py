@@ -1,9 +1,68 @@
 #!/usr/bin/env python3
 
 # Attention: Do not import the ev3dev.ev3 module in this file
-import json
 import ssl
-from queue import Queue
+import threading
+import time
+from collections import deque
+
+import messages
+from latency import LatencyTracer, TracedQueue
+
+
+class Reply:
+    """
+    Future-like handle returned by the send methods of Communication. It is resolved by the server message which
+    answers the sent one (planet for ready, path for path, pathSelect for pathSelect, done for targetReached and
+    explorationCompleted). The answer is still put into the queue of Communication as well.
+    """
+    def __init__(self, message_type):
+        """
+            :param message_type: String, type of the expected server message or None if there is no answer
+            """
+        self.message_type = message_type
+        self.message = None
+        self.cancelled = False
+        self.sent_at = time.perf_counter()
+        self.event = threading.Event()
+        if message_type is None:
+            self.event.set()
+
+    def resolve(self, message):
+        self.message = message
+        self.event.set()
+
+    def cancel(self):
+        """
+            Gives up on the answer, whoever waits for it is woken up and gets None.
+            :return: void
+            """
+        self.cancelled = True
+        self.event.set()
+
+    def done(self):
+        """
+            :return: bool, True if the answer has arrived (or none is expected)
+            """
+        return self.event.is_set()
+
+    def wait(self, timeout=None):
+        """
+            Blocks until the answer arrives.
+            :param timeout: float, seconds or None for no limit
+            :return: bool, True if the answer has arrived
+            """
+        return self.event.wait(timeout)
+
+    def result(self, timeout=None):
+        """
+            Blocks until the answer arrives and returns it.
+            :param timeout: float, seconds or None for no limit
+            :return: messages.Message, the server message or None if no answer is expected or the Reply was cancelled
+            """
+        if not self.event.wait(timeout):
+            raise TimeoutError(f'no {self.message_type} message from the server within {timeout} s')
+        return self.message
 
 
 # noinspection PyMethodMayBeStatic
@@ -32,9 +91,37 @@ class Communication:
         self.client.subscribe(topic='explorer/127', qos=2)
         self.client.subscribe(topic='comtest/127', qos=2)
         self.logger = logger
-        self.client.loop_start()
-        self.q = Queue()
+        # latencies of the answers and of the messages in the queue, see latency.py
+        self.tracer = LatencyTracer()
+        self.q = self.create_queue()
+        # topics by comtest-mode, the planet topics are set together with current_planet
+        self.explorer_topics = ('explorer/127', 'comtest/127')
+        self.planet_topics = None
         self.current_planet = ""
+        # notified for every queued message and when the server's answer window ends, see wait_for_message()
+        self.arrived = threading.Condition()
+        self.window_closed = False
+        # message type -> Replies waiting for a server message of that type, oldest first
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+        # started last, on_message needs everything above
+        self.client.loop_start()
+
+    def create_queue(self):
+        """
+            Creates the queue of received messages, called by the constructor before the client's loop starts.
+            :return: Queue-like object with put(), empty() and get()
+            """
+        return TracedQueue(self.tracer)
+
+    @property
+    def current_planet(self):
+        return self._current_planet
+
+    @current_planet.setter
+    def current_planet(self, name):
+        self._current_planet = name
+        self.planet_topics = (f'planet/{name}/127', f'comtest/{name}/127')
 
     # DO NOT EDIT THE METHOD SIGNATURE
     # noinspection PyUnusedLocal
@@ -46,15 +133,102 @@ class Communication:
             :param message: Object
             :return: void
             """
-        payload = json.loads(message.payload.decode('utf-8'))
-        self.logger.debug(json.dumps(payload, indent=2))
+        arrived_at = time.perf_counter()
+        # decoded once into a messages.Message, the log only formats it if debug logging is on
+        received = messages.decode(message.payload)
+        self.logger.debug('Received: %r', received)
 
         # YOUR CODE FOLLOWS (remove pass, please!)
-        json_dict = json.loads(message.payload.decode('utf-8'))
-        if json_dict['from'] == 'debug' and json_dict['from'] != 'adjust':
-            print(f'{json_dict} empfangen!')
-        if json_dict['from'] != 'client':
-            self.q.put(json_dict)
+        if received.sender == 'debug':
+            self.logger.info('%s empfangen!', received)
+        if received.sender != 'client':
+            # the decode stage ends when the message is in the queue, before any Reply is resolved
+            self.tracer.record('decode', received.type, time.perf_counter() - arrived_at)
+            self.q.put(received)
+            if received.sender == 'server' and received.type == 'pathSelect':
+                # the server decided on the path, it sends nothing more in this window
+                self.close_window()
+            else:
+                with self.arrived:
+                    self.arrived.notify_all()
+        if received.sender == 'server':
+            # resolved last, whoever waits for the Reply finds the answer already in the queue
+            self.resolve_reply(received)
+
+    def expect_reply(self, message_type):
+        """
+            Registers a Reply for the next server message of message_type, call it before sending. Older Replies of
+            that type which are still waiting are cancelled, the server does not have to answer every pathSelect and a
+            Reply somebody gave up on must not take the next answer away from the new one.
+            :param message_type: String, type of the server message
+            :return: Reply
+            """
+        reply = Reply(message_type)
+        with self.pending_lock:
+            waiting = self.pending.setdefault(message_type, deque())
+            stale = list(waiting)
+            waiting.clear()
+            waiting.append(reply)
+        for old in stale:
+            old.cancel()
+        return reply
+
+    def cancel_reply(self, reply):
+        """
+            Cancels a Reply which is still waiting, its answer (if it comes late) only goes into the queue.
+            :param reply: Reply returned by one of the send methods
+            :return: void
+            """
+        with self.pending_lock:
+            waiting = self.pending.get(reply.message_type)
+            if waiting and reply in waiting:
+                waiting.remove(reply)
+        reply.cancel()
+
+    def resolve_reply(self, message):
+        """
+            Resolves the oldest Reply waiting for the type of message.
+            :param message: messages.Message from the server
+            :return: void
+            """
+        with self.pending_lock:
+            waiting = self.pending.get(message.type)
+            reply = waiting.popleft() if waiting else None
+        if reply is not None:
+            self.tracer.record('round_trip', message.type, time.perf_counter() - reply.sent_at)
+            reply.resolve(message)
+
+    def open_window(self):
+        """
+            Starts a window in which answers of the server are expected, call it before sending the message.
+            :return: void
+            """
+        with self.arrived:
+            self.window_closed = False
+
+    def close_window(self):
+        """
+            Ends the current window early, wait_for_message() returns as soon as the queue is empty.
+            :return: void
+            """
+        with self.arrived:
+            self.window_closed = True
+            self.arrived.notify_all()
+
+    def wait_for_message(self, timeout):
+        """
+            Blocks without using the CPU until a message is in the queue, the window is closed or timeout passed.
+            :param timeout: float, seconds
+            :return: bool, True if there are messages in the queue
+            """
+        deadline = time.monotonic() + timeout
+        with self.arrived:
+            while self.q.empty() and not self.window_closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.arrived.wait(remaining)
+            return not self.q.empty()
 
     # DO NOT EDIT THE METHOD SIGNATURE
     #
@@ -65,11 +239,10 @@ class Communication:
         """
             Sends given message to specified channel
             :param topic: String
-            :param message: Object
+            :param message: bytes, encoded JSON from the encode functions of messages.py
             :return: void
             """
-        self.logger.debug('Send to: ' + topic)
-        self.logger.debug(json.dumps(message, indent=2))
+        self.logger.debug('Send to %s: %s', topic, message)
 
         # YOUR CODE FOLLOWS (remove pass, please!)
         self.client.publish(topic=topic, payload=message)
@@ -97,37 +270,31 @@ class Communication:
         """
             Sends a testPlanet message based on a specified current_planet variable
             :param comtest: bool, enables comtest-mode
-            :return: void
+            :return: Reply, already resolved because the server does not answer testPlanet
             """
-        if comtest:
-            self.send_message(topic='comtest/127', message='{"from": "client","type": "testPlanet","payload": {"planetName": "%s"}}' % self.current_planet)
-        else:
-            self.send_message(topic='explorer/127', message='{"from": "client","type": "testPlanet","payload": {"planetName": "%s"}}' % self.current_planet)
+        self.send_message(topic=self.explorer_topics[comtest], message=messages.encode_test_planet(self.current_planet))
+        return Reply(None)
 
     def send_ready(self, comtest=False):
         """
             Sends a ready message to indicate that the robot is ready.
             :param comtest: bool, enables comtest-mode
-            :return: void
+            :return: Reply, resolved by the planet message
             """
-        if comtest:
-            self.send_message(topic='comtest/127', message='{"from": "client","type": "ready"}')
-        else:
-            self.send_message(topic='explorer/127', message='{"from": "client","type": "ready"}')
+        reply = self.expect_reply('planet')
+        self.send_message(topic=self.explorer_topics[comtest], message=messages.READY)
+        return reply
 
     def receive_ready(self, message):
         """
             Receives the ready answer from the server with the corresponding planet name.
-            :param message: String, the message itself
+            :param message: messages.PlanetMessage
             :return: start_x, start_y, start_orientation
             """
-        self.current_planet = message['payload']['planetName']
-        print(self.current_planet)
-        start_x = message['payload']['startX']
-        start_y = message['payload']['startY']
-        start_orientation = message['payload']['startOrientation']
+        self.current_planet = message.planet_name
+        self.logger.info('Planet: %s', self.current_planet)
         self.client.subscribe(topic=f'planet/{self.current_planet}/127', qos=2)
-        return start_x, start_y, start_orientation
+        return message.start[0], message.start[1], message.start_orientation
 
     def send_path(self, start_coordinates_x, start_coordinates_y, start_orientation, current_coordinates_x, current_coordinates_y, current_orientation, path_status, comtest=False):
         """
@@ -140,28 +307,19 @@ class Communication:
             :param current_orientation: String, orientation of the path end
             :param path_status: String "free|blocked", status whether the path is free or blocked
             :param comtest: bool, enables comtest-mode
-            :return: void
+            :return: Reply, resolved by the path message with the corrected path
             """
-        if comtest:
-            self.send_message(topic=f'comtest/{self.current_planet}/127', message='{"from": "client","type":"path","payload": {"startX": %s,"startY": %s,"startDirection": %s, "endX": %s, "endY": %s, "endDirection": %s, "pathStatus": "%s"}}' % (start_coordinates_x, start_coordinates_y, start_orientation, current_coordinates_x, current_coordinates_y, current_orientation, path_status))
-        else:
-            self.send_message(topic=f'planet/{self.current_planet}/127', message='{"from": "client","type":"path","payload": {"startX": %s,"startY": %s,"startDirection": %s, "endX": %s, "endY": %s, "endDirection": %s, "pathStatus": "%s"}}' % (start_coordinates_x, start_coordinates_y, start_orientation, current_coordinates_x, current_coordinates_y, current_orientation, path_status))
+        reply = self.expect_reply('path')
+        self.send_message(topic=self.planet_topics[comtest], message=messages.encode_path(start_coordinates_x, start_coordinates_y, start_orientation, current_coordinates_x, current_coordinates_y, current_orientation, path_status))
+        return reply
 
     def receive_path(self, message):
         """
             Receives the answer from the server regarding the sent message, potentially with corrected path end coordinates or direction
-            :param message: String, the message itself
+            :param message: messages.PathMessage
             :return: current_x, current_y, current_orientation, end_x, end_y, end_orientation, path_weight
             """
-        start_x = message['payload']['startX']
-        start_y = message['payload']['startY']
-        start_orientation = message['payload']['startDirection']
-        end_x = message['payload']['endX']
-        end_y = message['payload']['endY']
-        end_orientation = message['payload']['endDirection']
-        path_status = message['payload']['pathStatus']
-        path_weight = message['payload']['pathWeight']
-        return start_x, start_y, start_orientation, end_x, end_y, end_orientation, path_status, path_weight
+        return message.start[0], message.start[1], message.start_direction, message.end[0], message.end[1], message.end_direction, message.status, message.weight
 
     def send_pathselect(self, current_coordinates_x, current_coordinates_y, start_direction, comtest=False):
         """
@@ -170,72 +328,63 @@ class Communication:
             :param current_coordinates_y: String, y-coordinate of next chosen path
             :param start_direction: String, orientation from current node to next chosen path
             :param comtest: bool, enables comtest-mode
-            :return: void
+            :return: Reply, resolved only if the server chooses the path itself
             """
-        if comtest:
-            self.send_message(topic=f'comtest/{self.current_planet}/127', message='{"from": "client","type": "pathSelect","payload": {"startX": %s,"startY": %s,"startDirection": %s}}' % (current_coordinates_x, current_coordinates_y, start_direction))
-        else:
-            self.send_message(topic=f'planet/{self.current_planet}/127', message='{"from": "client","type": "pathSelect","payload": {"startX": %s,"startY": %s,"startDirection": %s}}' % (current_coordinates_x, current_coordinates_y, start_direction))
+        reply = self.expect_reply('pathSelect')
+        self.send_message(topic=self.planet_topics[comtest], message=messages.encode_path_select(current_coordinates_x, current_coordinates_y, start_direction))
+        return reply
 
     def receive_pathselect(self, message):
         """
             Receives the potential pathSelect-message which tells the robot which direction to take next
-            :param message: String, the message itself
-            :return current_orientation: integer
+            :param message: messages.PathSelectMessage
+            :return current_orientation: Direction
             """
-        current_orientation = message['payload']['startDirection']
-        return current_orientation
+        return message.start_direction
 
     def receive_pathunveiled(self, message):
         """
             Receives the potential pathUnveiled-message which unveils a path
             on the map as either free or blocked - with coordinates and direction
-            :param message: String, the message itself
+            :param message: messages.PathUnveiledMessage
             :return: unveiled_start_x,  unveiled_start_y, unveiled_start_orientation, unveiled_end_x, unveiled_end_y,
             unveiled_end_orientation, unveiled_path_status, unveiled_path_weight
             """
-        unveiled_start_x = message['payload']['startX']
-        unveiled_start_y = message['payload']['startY']
-        unveiled_start_orientation = message['payload']['startDirection']
-        unveiled_end_x = message['payload']['endX']
-        unveiled_end_y = message['payload']['endY']
-        unveiled_end_orientation = message['payload']['endDirection']
-        unveiled_path_status = message['payload']['pathStatus']
-        unveiled_path_weight = message['payload']['pathWeight']
-        return unveiled_start_x, unveiled_start_y, unveiled_start_orientation, unveiled_end_x, unveiled_end_y, unveiled_end_orientation, str(unveiled_path_status), unveiled_path_weight,
+        return self.receive_path(message)
 
     def receive_target(self, message):
-        target_coordinates_x = message['payload']['targetX']
-        target_coordinates_y = message['payload']['targetY']
-        return target_coordinates_x, target_coordinates_y
+        """
+            :param message: messages.TargetMessage
+            :return: target_x, target_y
+            """
+        return message.target
 
     def send_target_reached(self, target_reached_response, comtest=False):
         """
             Sends a target-reached-message to indicate that the given target has been reached.
             :param target_reached_response: String, message to embed in the emitted response to the server
             :param comtest: bool, enables comtest-mode
+            :return: Reply, resolved by the done message
             """
-        if comtest:
-            self.send_message(topic='comtest/127', message='{"from": "client","type": "targetReached","payload": {"message": "' + target_reached_response + '"}}')
-        else:
-            self.send_message(topic='explorer/127', message='{"from": "client","type": "targetReached","payload": {"message": "' + target_reached_response + '"}}')
+        reply = self.expect_reply('done')
+        self.send_message(topic=self.explorer_topics[comtest], message=messages.encode_target_reached(target_reached_response))
+        return reply
 
     def send_exploration_completed(self, exploration_completed_response, comtest=False):
         """
             Sends an exploration-completed message to indicate that the planet has been fully explored.
             :param exploration_completed_response: String, message to embed in the emitted response to the server
             :param comtest: bool, enables comtest-mode
+            :return: Reply, resolved by the done message
             """
-        if comtest:
-            self.send_message(topic='comtest/127', message='{"from": "client","type": "explorationCompleted","payload": {"message": "' + exploration_completed_response + '"}}')
-        else:
-            self.send_message(topic='explorer/127', message='{"from": "client","type": "explorationCompleted","payload": {"message": "' + exploration_completed_response + '"}}')
+        reply = self.expect_reply('done')
+        self.send_message(topic=self.explorer_topics[comtest], message=messages.encode_exploration_completed(exploration_completed_response))
+        return reply
 
     def receive_complete(self, message):
         """
             Receives the complete-message which confirms the mission is completed.
-            :param message: String, the message itself
-            :return: void
+            :param message: messages.DoneMessage
+            :return: String, the text of the message
             """
-        completion_message = message['payload']['message']
-        return completion_message
+        return message.message
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+# Attention: Do not import the ev3dev.ev3 module in this file
+from heapq import heappush, heappop
+from typing import List, Tuple, Dict, Union, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from planet import Direction
+    from pathfinding import SearchStats
+
+
+Node = Tuple[int, int]
+Path = List[Tuple[Node, 'Direction']]
+# edge to (or from) a neighbour: (weight, contracted middle node or None, direction at the start of an original path)
+Edge = Tuple[int, Optional[Node], Optional['Direction']]
+
+
+class ContractionHierarchy:
+    """
+    Shortcut index for fast shortest path queries on a planet that does not change any more.
+    The nodes are contracted one after another (least important first, by edge difference). Whenever a node is
+    removed, shortcuts keep the distances between its remaining neighbours, unless a witness search finds another
+    path which is at most as long. A query then only runs two small Dijkstra searches which climb to more
+    important nodes, and unpacks the shortcuts of the path found.
+    """
+    def __init__(self, paths: Dict[Node, Dict['Direction', Tuple[Node, 'Direction', int]]], witness_limit: int = 64):
+        """
+            Contracts all nodes of paths.
+            :param paths: Dict in the format of Planet.get_traversable_paths()
+            :param witness_limit: Integer, maximum number of nodes settled by one witness search. Smaller values
+                build faster but add more (unnecessary) shortcuts.
+            """
+        self.witness_limit = witness_limit
+        # remaining graph during the contraction: node -> {neighbour: Edge}
+        out_edges: Dict[Node, Dict[Node, Edge]] = {node: {} for node in paths}
+        in_edges: Dict[Node, Dict[Node, Edge]] = {node: {} for node in paths}
+        for node, node_paths in paths.items():
+            for direction, (target, _, weight) in node_paths.items():
+                if target == node:
+                    continue
+                edge = out_edges[node].get(target)
+                if edge is None or weight < edge[0]:
+                    out_edges[node][target] = in_edges[target][node] = (weight, None, direction)
+
+        # up[node]: edges node -> more important neighbour, down[node]: edges more important neighbour -> node
+        self.up: Dict[Node, Dict[Node, Edge]] = {}
+        self.down: Dict[Node, Dict[Node, Edge]] = {}
+        self.rank: Dict[Node, int] = {}
+        self.shortcuts = 0
+
+        contracted_neighbours = dict.fromkeys(paths, 0)
+        heap = []
+        for counter, node in enumerate(paths):
+            heappush(heap, (self._priority(node, out_edges, in_edges, contracted_neighbours), counter, node))
+        counter = len(heap)
+        while heap:
+            _, _, node = heappop(heap)
+            priority = self._priority(node, out_edges, in_edges, contracted_neighbours)
+            if heap and priority > heap[0][0]:
+                heappush(heap, (priority, counter, node))
+                counter += 1
+                continue
+            self._contract(node, out_edges, in_edges, contracted_neighbours)
+
+    def _shortcuts(self, node: Node, out_edges: Dict[Node, Dict[Node, Edge]],
+                   in_edges: Dict[Node, Dict[Node, Edge]]) -> List[Tuple[Node, Node, int]]:
+        """
+            Returns the shortcuts (source, target, weight) which removing node from the remaining graph needs.
+            """
+        shortcuts = []
+        for source, (in_weight, _, _) in in_edges[node].items():
+            targets = {target: in_weight + out_weight for target, (out_weight, _, _) in out_edges[node].items()
+                       if target != source}
+            if not targets:
+                continue
+            distances = self._witness_search(source, node, max(targets.values()), out_edges)
+            for target, weight in targets.items():
+                if distances.get(target, weight + 1) > weight:
+                    shortcuts.append((source, target, weight))
+        return shortcuts
+
+    def _witness_search(self, source: Node, avoid: Node, limit: int,
+                        out_edges: Dict[Node, Dict[Node, Edge]]) -> Dict[Node, int]:
+        """
+            Dijkstra from source in the remaining graph without avoid, up to distance limit and witness_limit nodes.
+            """
+        distances = {source: 0}
+        heap = [(0, source)]
+        settled = 0
+        while heap and settled < self.witness_limit:
+            dist, node = heappop(heap)
+            if dist > limit:
+                break
+            if dist > distances[node]:
+                continue
+            settled += 1
+            for target, (weight, _, _) in out_edges[node].items():
+                if target == avoid:
+                    continue
+                if dist + weight < distances.get(target, limit + 1):
+                    distances[target] = dist + weight
+                    heappush(heap, (dist + weight, target))
+        return distances
+
+    def _priority(self, node: Node, out_edges: Dict[Node, Dict[Node, Edge]], in_edges: Dict[Node, Dict[Node, Edge]],
+                  contracted_neighbours: Dict[Node, int]) -> int:
+        """
+            Edge difference of contracting node plus the number of its already contracted neighbours.
+            """
+        removed = len(out_edges[node]) + len(in_edges[node])
+        return len(self._shortcuts(node, out_edges, in_edges)) - removed + contracted_neighbours[node]
+
+    def _contract(self, node: Node, out_edges: Dict[Node, Dict[Node, Edge]], in_edges: Dict[Node, Dict[Node, Edge]],
+                  contracted_neighbours: Dict[Node, int]):
+        """
+            Removes node from the remaining graph, keeps its remaining edges as upward edges and adds the shortcuts.
+            """
+        shortcuts = self._shortcuts(node, out_edges, in_edges)
+        self.rank[node] = len(self.rank)
+        self.up[node] = out_edges.pop(node)
+        self.down[node] = in_edges.pop(node)
+        for target in self.up[node]:
+            del in_edges[target][node]
+            contracted_neighbours[target] += 1
+        for source in self.down[node]:
+            del out_edges[source][node]
+            contracted_neighbours[source] += 1
+        for source, target, weight in shortcuts:
+            edge = out_edges[source].get(target)
+            if edge is None or weight < edge[0]:
+                out_edges[source][target] = in_edges[target][source] = (weight, node, None)
+                self.shortcuts += 1
+
+    def shortest_path(self, start: Node, target: Node, stats: Optional['SearchStats'] = None) -> Union[None, Path]:
+        """
+            Returns the shortest path between two nodes.
+            :param start: 2-Tuple
+            :param target: 2-Tuple
+            :param stats: SearchStats which counts the expanded nodes
+            :return: List[2-Tuple, Direction] or None if the target is not reachable
+            """
+        if start == target:
+            return []
+        if start not in self.rank or target not in self.rank:
+            return None
+
+        # forward: node -> (distance, previous node), backward: node -> (distance to target, next node)
+        forward = {start: (0, None)}
+        backward = {target: (0, None)}
+        forward_heap = [(0, start)]
+        backward_heap = [(0, target)]
+        best = None
+        meeting = None
+        expanded = 0
+        while forward_heap or backward_heap:
+            if forward_heap and (not backward_heap or forward_heap[0][0] <= backward_heap[0][0]):
+                heap, table, other, edges = forward_heap, forward, backward, self.up
+            else:
+                heap, table, other, edges = backward_heap, backward, forward, self.down
+            dist, node = heappop(heap)
+            if best is not None and dist >= best:
+                heap.clear()
+                continue
+            if dist > table[node][0]:
+                continue
+            expanded += 1
+            if node in other and (best is None or dist + other[node][0] < best):
+                best = dist + other[node][0]
+                meeting = node
+            for neighbour, (weight, _, _) in edges[node].items():
+                entry = table.get(neighbour)
+                if entry is None or dist + weight < entry[0]:
+                    table[neighbour] = (dist + weight, node)
+                    heappush(heap, (dist + weight, neighbour))
+        if stats is not None:
+            stats.add(expanded)
+
+        if meeting is None:
+            return None
+        nodes = [meeting]
+        while nodes[-1] != start:
+            nodes.append(forward[nodes[-1]][1])
+        nodes.reverse()
+        while nodes[-1] != target:
+            nodes.append(backward[nodes[-1]][1])
+        path: Path = []
+        for source, destination in zip(nodes, nodes[1:]):
+            self._unpack(source, destination, path)
+        return path
+
+    def _unpack(self, source: Node, target: Node, path: Path):
+        """
+            Appends the original paths behind the (shortcut) edge source -> target to path.
+            """
+        stack = [(source, target)]
+        while stack:
+            source, target = stack.pop()
+            edge = self.up[source].get(target)
+            if edge is None:
+                edge = self.down[target][source]
+            _, middle, direction = edge
+            if middle is None:
+                path.append((source, direction))
+            else:
+                stack.append((middle, target))
+                stack.append((source, middle))
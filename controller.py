@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+
+# Attention: Do not import the ev3dev.ev3 module in this file
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Tuple, Optional
+
+import messages
+import robot_log
+import snapshot
+from communication import Communication
+from exploration import ExplorationStrategy, StackStrategy
+from planet import Direction, Planet
+
+logger = robot_log.get_logger('main')
+
+
+def opposite(direction) -> Direction:
+    return Direction((int(direction) + 180) % 360)
+
+
+class MessageBridge:
+    """
+    Thread-safe bridge from the MQTT network thread to asyncio. BridgedCommunication puts the decoded messages into
+    it (it is its q) and the controller awaits them in the event loop.
+    """
+    def __init__(self, loop: asyncio.AbstractEventLoop, tracer=None):
+        """
+            :param loop: event loop of the controller
+            :param tracer: latency.LatencyTracer for the time the messages wait in the bridge or None
+            """
+        self.loop = loop
+        self.thread = threading.get_ident()
+        self.queue = asyncio.Queue()
+        self.tracer = tracer
+
+    def put(self, message):
+        stamped = (message, time.perf_counter())
+        if threading.get_ident() == self.thread:
+            # delivered from inside the loop, e.g. by the simulator
+            self.queue.put_nowait(stamped)
+        else:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, stamped)
+
+    def empty(self) -> bool:
+        return self.queue.empty()
+
+    def qsize(self) -> int:
+        return self.queue.qsize()
+
+    def _taken(self, stamped) -> messages.Message:
+        message, enqueued = stamped
+        if self.tracer is not None:
+            self.tracer.record('queue', message.type, time.perf_counter() - enqueued)
+        return message
+
+    async def get(self, timeout: Optional[float] = None) -> messages.Message:
+        """
+            :param timeout: float, seconds or None for no limit
+            :return: messages.Message, the next message (raises TimeoutError if none arrives in time)
+            """
+        return self._taken(await asyncio.wait_for(self.queue.get(), timeout))
+
+    def get_nowait(self) -> Optional[messages.Message]:
+        """
+            :return: messages.Message, the next message which has already arrived or None
+            """
+        try:
+            return self._taken(self.queue.get_nowait())
+        except asyncio.QueueEmpty:
+            return None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> messages.Message:
+        return await self.get()
+
+
+class BridgedCommunication(Communication):
+    """
+    Communication which puts the received messages into a MessageBridge from the start instead of a queue.
+    """
+    def __init__(self, mqtt_client, logger, bridge: MessageBridge):
+        """
+            :param mqtt_client: paho.mqtt.client.Client
+            :param logger: logging.Logger
+            :param bridge: MessageBridge, created in the thread of the event loop
+            """
+        self.bridge = bridge
+        super().__init__(mqtt_client, logger)
+
+    def create_queue(self) -> MessageBridge:
+        self.bridge.tracer = self.tracer
+        return self.bridge
+
+
+class MissionState:
+    """
+    Everything the controller knows about the running mission.
+    """
+    __slots__ = ('planet', 'position', 'orientation', 'path_start', 'path_status', 'target', 'selecting',
+                 'commanded_direction', 'changes', 'completed', 'done_message', 'paths_driven', 'speculations_used')
+
+    def __init__(self, planet: Planet):
+        self.planet = planet
+        self.position: Optional[Tuple[int, int]] = None
+        # direction the robot faces
+        self.orientation = Direction.NORTH
+        # start node and direction of the path being driven
+        self.path_start: Optional[Tuple[Tuple[int, int], Direction]] = None
+        self.path_status = "free"
+        self.target: Optional[Tuple[int, int]] = None
+        # True while the server may still choose the next path
+        self.selecting = False
+        self.commanded_direction: Optional[Direction] = None
+        # counts the messages which change the map or the mission besides the confirmation of a driven path
+        self.changes = 0
+        self.completed = False
+        self.done_message = None
+        self.paths_driven = 0
+        self.speculations_used = 0
+
+
+class MissionController:
+    """
+    Asyncio alternative to main.run. The MQTT messages arrive through a MessageBridge, the blocking motor actions
+    run in threads, and while the robot drives a known path the decision for the node at its end is planned at the
+    same time. That plan is used if the server confirms the node and no other message changed the map meanwhile.
+    All state is in a MissionState, so several controllers can run in one process (see simulator.run_missions_async).
+    """
+    def __init__(self, mqtt_client, movement, strategy: Optional[ExplorationStrategy] = None,
+                 reply_timeout: float = 10, path_select_window: float = 3, planet_directory: Optional[str] = None,
+                 speculate: bool = True):
+        """
+            :param mqtt_client: paho.mqtt.client.Client or simulator.PlanetServer
+            :param movement: Movement or simulator.SimulatedMovement
+            :param strategy: ExplorationStrategy, StackStrategy() if None
+            :param reply_timeout: float, seconds to wait for an answer of the server
+            :param path_select_window: float, seconds in which the server may choose another path
+            :param planet_directory: String, directory of the snapshots (see snapshot.py) or None
+            :param speculate: bool, plan the next decision while driving
+            """
+        self.client = mqtt_client
+        self.movement = movement
+        self.strategy = strategy if strategy is not None else StackStrategy()
+        self.reply_timeout = reply_timeout
+        self.path_select_window = path_select_window
+        self.planet_directory = planet_directory
+        self.speculate = speculate
+        self.state = MissionState(Planet())
+        self.communication: Optional[BridgedCommunication] = None
+        self.bridge: Optional[MessageBridge] = None
+        self.handlers = {
+            messages.PlanetMessage: self.on_planet,
+            messages.PathMessage: self.on_path,
+            messages.PathSelectMessage: self.on_pathselect,
+            messages.PathUnveiledMessage: self.on_pathunveiled,
+            messages.TargetMessage: self.on_target,
+            messages.DoneMessage: self.on_done,
+        }
+
+    # message handlers, called in the event loop
+    def handle(self, message: messages.Message):
+        handler = self.handlers.get(type(message))
+        if handler is not None:
+            handler(message)
+        elif message.sender != 'debug':
+            logger.error('Falscher Nachrichtentyp: %s', message)
+
+    def on_planet(self, message: messages.PlanetMessage):
+        self.communication.receive_ready(message)
+        if self.planet_directory is not None:
+            self.state.planet = snapshot.open_planet(message.planet_name, self.planet_directory)
+        self.state.position = message.start
+        self.state.orientation = message.start_orientation
+        self.state.changes += 1
+
+    def on_path(self, message: messages.PathMessage):
+        state = self.state
+        invalidations = state.planet.cache_invalidations
+        state.planet.add_path((message.start, message.start_direction), (message.end, message.end_direction),
+                              message.weight)
+        if state.planet.cache_invalidations != invalidations:
+            state.changes += 1
+        state.position = message.end
+        state.orientation = opposite(message.end_direction)
+        state.path_status = message.status
+
+    def on_pathselect(self, message: messages.PathSelectMessage):
+        if not self.state.selecting:
+            logger.warning('pathSelect außerhalb des Fensters ignoriert: %s', message)
+            return
+        self.state.commanded_direction = message.start_direction
+
+    def on_pathunveiled(self, message: messages.PathUnveiledMessage):
+        planet = self.state.planet
+        planet.push_unexplored(message.start)
+        planet.push_unexplored(message.end)
+        planet.add_path((message.start, message.start_direction), (message.end, message.end_direction), message.weight)
+        planet.update_direction((message.start, message.start_direction), [message.start_direction])
+        planet.update_direction((message.end, message.end_direction), [message.end_direction])
+        self.state.changes += 1
+
+    def on_target(self, message: messages.TargetMessage):
+        self.state.target = message.target
+        self.state.changes += 1
+
+    def on_done(self, message: messages.DoneMessage):
+        self.state.completed = True
+        self.state.done_message = message.message
+
+    # waiting for messages
+    async def await_message(self, message_type, timeout: float) -> messages.Message:
+        """
+            Handles the incoming messages until one of message_type arrives. The controller cannot go on without it,
+            so a slow server only gets a warning every timeout seconds.
+            :return: messages.Message of message_type
+            """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        waited = 0
+        while True:
+            remaining = deadline - loop.time()
+            try:
+                message = await self.bridge.get(max(remaining, 0))
+            except asyncio.TimeoutError:
+                waited += timeout
+                logger.warning('Keine %s-Antwort vom Server nach %s s, warte weiter', message_type.type, waited)
+                deadline = loop.time() + timeout
+                continue
+            self.handle(message)
+            # exact type, a PathUnveiledMessage is a PathMessage too but does not answer the sent path
+            if type(message) is message_type:
+                return message
+
+    async def selection_window(self):
+        """
+            Handles the messages of the server's window after a pathSelect, it ends early with the server's choice.
+            :return: void
+            """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.path_select_window
+        self.state.selecting = True
+        try:
+            while self.state.commanded_direction is None:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    self.handle(await self.bridge.get(remaining))
+                except asyncio.TimeoutError:
+                    break
+            # messages which are already there still belong to the window
+            message = self.bridge.get_nowait()
+            while message is not None:
+                self.handle(message)
+                message = self.bridge.get_nowait()
+        finally:
+            self.state.selecting = False
+
+    # planning
+    def decide(self, node: Tuple[int, int], heading) -> Optional[Direction]:
+        """
+            :param node: 2-Tuple, node the robot is at (or will be at)
+            :param heading: Direction the robot faces there
+            :return: Direction to leave node in or None if there is nothing left to do
+            """
+        state = self.state
+        if state.target is not None:
+            path = state.planet.shortest_path(node, state.target, heading=heading)
+            if path:
+                return path[0][1]
+        return self.strategy.next_direction(state.planet, node)
+
+    def expected_end(self, direction: Direction) -> Optional[Tuple[Tuple[int, int], Direction]]:
+        """
+            :return: (node, Direction the robot will face) at the end of the known, free path the robot is about to
+            drive from its position in direction, None if the path is unknown, blocked or its end not scanned yet
+            """
+        state = self.state
+        path = state.planet.get_paths().get(state.position, {}).get(direction)
+        if path is None or path[2] == -1 or path[0] not in state.planet.visited_nodes or path[0] == state.target:
+            return None
+        return path[0], opposite(path[1])
+
+    async def run(self) -> MissionState:
+        """
+            Runs the mission until the server confirms it with done, the robot has nothing left to do or the robot
+            aborts.
+            :return: MissionState
+            """
+        loop = asyncio.get_running_loop()
+        state = self.state
+        self.bridge = MessageBridge(loop)
+        # connecting blocks, the bridge gets every message from the start of the client's loop on
+        self.communication = await loop.run_in_executor(None, BridgedCommunication, self.client,
+                                                        robot_log.get_logger('communication'), self.bridge)
+        try:
+            await loop.run_in_executor(None, self.movement.linefollow)
+            self.communication.send_ready()
+            await self.await_message(messages.PlanetMessage, self.reply_timeout)
+            speculation = None
+            while not state.completed:
+                if state.path_start is not None:
+                    # the server confirms the driven path and tells where the robot is
+                    node, direction = state.path_start
+                    end = node if state.path_status == "blocked" else state.position
+                    end_direction = direction if state.path_status == "blocked" else opposite(state.orientation)
+                    changes = state.changes
+                    self.communication.send_path(node[0], node[1], direction, end[0], end[1], end_direction,
+                                                 state.path_status)
+                    await self.await_message(messages.PathMessage, self.reply_timeout)
+                    if speculation is not None and (speculation[0] != state.position or state.changes != changes):
+                        speculation = None
+                planet = state.planet
+                if state.position not in planet.visited_nodes:
+                    scanned = await loop.run_in_executor(None, self.movement.node_scan, state.orientation)
+                    planet.add_directions(state.position, planet.check_paths(state.position, list(scanned)))
+                    planet.mark_visited(state.position)
+                    speculation = None
+
+                if state.target is not None and state.position == state.target:
+                    self.communication.send_target_reached('Ziel erreicht')
+                    await self.await_message(messages.DoneMessage, self.reply_timeout)
+                    break
+                if speculation is not None:
+                    next_direction = speculation[1]
+                    state.speculations_used += 1
+                else:
+                    next_direction = await loop.run_in_executor(None, self.decide, state.position, state.orientation)
+                if next_direction is None:
+                    self.communication.send_exploration_completed('Planet erkundet')
+                    await self.await_message(messages.DoneMessage, self.reply_timeout)
+                    break
+
+                state.commanded_direction = None
+                self.communication.send_pathselect(state.position[0], state.position[1], next_direction)
+                await self.selection_window()
+                if state.commanded_direction is not None:
+                    next_direction = state.commanded_direction
+                planet.update_certain(next_direction, state.position)
+
+                await loop.run_in_executor(None, self.movement.turn, next_direction, state.orientation)
+                state.orientation = Direction(int(next_direction))
+                state.path_start = (state.position, next_direction)
+                expected = self.expected_end(next_direction) if self.speculate else None
+                drive = loop.run_in_executor(None, self.movement.linefollow)
+                if expected is not None:
+                    plan = loop.run_in_executor(None, self.decide, *expected)
+                    state.path_status, planned = await asyncio.gather(drive, plan)
+                    speculation = (expected[0], planned)
+                else:
+                    state.path_status = await drive
+                    speculation = None
+                state.paths_driven += 1
+            self.movement.tetris()
+        finally:
+            if self.communication.current_planet and self.planet_directory is not None:
+                snapshot.checkpoint(state.planet, self.communication.current_planet, self.planet_directory)
+            logger.info('Latenzen der Kommunikation:\n%s', self.communication.tracer.report())
+            self.client.loop_stop()
+            self.client.disconnect()
+        return state
+
+
+def run(mqtt_client=None, movement_backend=None, strategy: Optional[ExplorationStrategy] = None) -> MissionState:
+    """
+        Runs a mission with the MissionController. Without arguments on the robot with the real MQTT client, motors,
+        log file and snapshots like main.run.
+        """
+    planet_directory = None
+    if mqtt_client is None:
+        import paho.mqtt.client as mqtt
+        mqtt_client = mqtt.Client(client_id='127-' + str(uuid.uuid4()), clean_session=True, protocol=mqtt.MQTTv311)
+        curr_dir = os.path.abspath(os.getcwd())
+        os.makedirs(curr_dir + '/../logs', exist_ok=True)
+        robot_log.start_logging(curr_dir + '/../logs/project.log', level=logging.INFO, console_level=logging.INFO,
+                                levels={'communication': logging.DEBUG})
+        planet_directory = curr_dir + '/../planets'
+    if movement_backend is None:
+        from movement import Movement
+        movement_backend = Movement()
+    try:
+        return asyncio.run(MissionController(mqtt_client, movement_backend, strategy,
+                                             planet_directory=planet_directory).run())
+    finally:
+        if planet_directory is not None:
+            robot_log.stop_logging()
+
+
+if __name__ == '__main__':
+    run()
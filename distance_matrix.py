@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+# Attention: Do not import the ev3dev.ev3 module in this file
+from typing import List, Tuple, Dict, Union, Optional, TYPE_CHECKING
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, only this module needs it
+    np = None
+
+if TYPE_CHECKING:
+    from planet import Direction
+
+
+class DistanceMatrix:
+    """
+    Shortest path distances between all pairs of nodes of a planet, computed with a vectorized Floyd-Warshall.
+    distances[i, j] is the weight of the shortest path from nodes[i] to nodes[j] (inf if not reachable),
+    next_hops[i, j] the index of the node after nodes[i] on that path (-1 if not reachable) and
+    directions[i, j] the direction / 90 of the cheapest path from nodes[i] directly to nodes[j] (-1 if none).
+    """
+    def __init__(self, paths: Dict[Tuple[int, int], Dict['Direction', Tuple[Tuple[int, int], 'Direction', int]]]):
+        """
+            Computes the matrices.
+            :param paths: Dict in the format of Planet.get_traversable_paths()
+            """
+        if np is None:
+            raise ImportError('DistanceMatrix needs numpy, install it with "pip install numpy"')
+        self.nodes: List[Tuple[int, int]] = list(paths)
+        self.index: Dict[Tuple[int, int], int] = {node: i for i, node in enumerate(self.nodes)}
+        size = len(self.nodes)
+        distances = np.full((size, size), np.inf)
+        next_hops = np.full((size, size), -1, dtype=np.int32)
+        self.directions = np.full((size, size), -1, dtype=np.int8)
+        for i, node in enumerate(self.nodes):
+            for direction, (target, _, weight) in paths[node].items():
+                j = self.index.get(target)
+                if j is None or i == j or weight >= distances[i, j]:
+                    continue
+                distances[i, j] = weight
+                next_hops[i, j] = j
+                self.directions[i, j] = int(direction) // 90
+        np.fill_diagonal(distances, 0)
+        np.fill_diagonal(next_hops, np.arange(size, dtype=np.int32))
+
+        via = np.empty_like(distances)
+        shorter = np.empty((size, size), dtype=bool)
+        for k in range(size):
+            # all routes i -> k -> j at once, row and column k do not change in this step
+            np.add(distances[:, k, None], distances[k], out=via)
+            np.less(via, distances, out=shorter)
+            np.copyto(distances, via, where=shorter)
+            np.copyto(next_hops, next_hops[:, k, None], where=shorter)
+        self.distances = distances
+        self.next_hops = next_hops
+
+    def distance(self, start: Tuple[int, int], target: Tuple[int, int]) -> Optional[float]:
+        """
+            :return: weight of the shortest path from start to target or None if it is not reachable
+            """
+        i, j = self.index.get(start), self.index.get(target)
+        if i is None or j is None or self.next_hops[i, j] == -1:
+            return None
+        return float(self.distances[i, j])
+
+    def path(self, start: Tuple[int, int], target: Tuple[int, int]) -> Union[None, List[Tuple[Tuple[int, int], 'Direction']]]:
+        """
+            Follows the next hops from start to target.
+            :param start: 2-Tuple
+            :param target: 2-Tuple
+            :return: List[2-Tuple, Direction] like Planet.shortest_path or None if target is not reachable
+            """
+        i, j = self.index.get(start), self.index.get(target)
+        if i is None or j is None or self.next_hops[i, j] == -1:
+            return None
+        from planet import Direction
+        path = []
+        while i != j:
+            hop = int(self.next_hops[i, j])
+            path.append((self.nodes[i], Direction(int(self.directions[i, hop]) * 90)))
+            i = hop
+        return path
+
+    def submatrix(self, nodes: List[Tuple[int, int]]):
+        """
+            :param nodes: List[2-Tuple], nodes of the planet
+            :return: numpy array with the distances between nodes, in the given order
+            """
+        indices = [self.index[node] for node in nodes]
+        return self.distances[np.ix_(indices, indices)]
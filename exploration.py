@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+
+# Attention: Do not import the ev3dev.ev3 module in this file
+from typing import List, Tuple, Dict, Optional
+
+import pathfinding
+from planet import Direction, Planet, ExplorationState
+
+
+class ExplorationStrategy:
+    """
+    Decides in which direction the robot leaves the current node while exploring a planet.
+    """
+    def next_direction(self, planet: Planet, start: Tuple[int, int]) -> Optional[Direction]:
+        """
+            :param planet: Planet, the map explored so far
+            :param start: 2-Tuple, current coordinates
+            :return: Direction or None if there is nothing left to explore
+            """
+        raise NotImplementedError
+
+    def frontier(self, planet: Planet) -> List[Tuple[int, int]]:
+        """
+            Returns all nodes with paths which still have to be visited: nodes with undiscovered directions
+            and nodes which are only known from paths and have not been scanned yet.
+            :param planet: Planet
+            :return: List[2-Tuple]
+            """
+        return [node for node in planet.get_paths() if planet.exploration_state(node) != ExplorationState.EXPLORED]
+
+    def direction_to(self, planet: Planet, start: Tuple[int, int], path) -> Optional[Direction]:
+        """
+            Returns the first direction of path or the next undiscovered direction of start if path is empty.
+            """
+        if path is None:
+            return None
+        if not path:
+            return planet.next_unexplored_direction(start)
+        return path[0][1]
+
+
+class StackStrategy(ExplorationStrategy):
+    """
+    Original strategy: drives to the node on top of Planet.unexplored_nodes.
+    """
+    def next_direction(self, planet: Planet, start: Tuple[int, int]) -> Optional[Direction]:
+        return planet.next_unexplored_node_and_direction(start)
+
+
+class NearestFrontierStrategy(ExplorationStrategy):
+    """
+    Greedy strategy: drives to the closest node which still has to be visited.
+    """
+    def next_direction(self, planet: Planet, start: Tuple[int, int]) -> Optional[Direction]:
+        if start not in planet.get_paths():
+            return planet.next_unexplored_direction(start)
+        return self.direction_to(planet, start, planet.shortest_unexplored_path(start))
+
+
+class TourStrategy(ExplorationStrategy):
+    """
+    Plans a tour over all nodes which still have to be visited and drives to the first one. The tour is built
+    from the robot's current node with the nearest neighbour heuristic on the shortest path distances and improved
+    with 2-opt moves. It is planned again whenever the frontier changes, because exploring a node moves the robot
+    to wherever its undiscovered path leads and the rest of an older tour no longer fits.
+
+    In the Monte-Carlo comparison (montecarlo.py, 60 missions of 10 to 100 nodes) it drives about as much weight as
+    NearestFrontierStrategy (210 vs 207 on average) at more than ten times its planning CPU, so it is no improvement
+    over the greedy strategy and is kept for comparisons.
+    """
+    def __init__(self, max_two_opt_rounds: int = 20, use_distance_matrix: bool = False):
+        """
+            :param max_two_opt_rounds: Integer, upper bound for the passes over the tour looking for improvements
+            :param use_distance_matrix: bool, take the distances from Planet.distance_matrix() (needs numpy)
+                instead of one Dijkstra search per frontier node
+            """
+        self.max_two_opt_rounds = max_two_opt_rounds
+        self.use_distance_matrix = use_distance_matrix
+        self.tour: List[Tuple[int, int]] = []
+        self.planned = set()
+
+    def next_direction(self, planet: Planet, start: Tuple[int, int]) -> Optional[Direction]:
+        if start not in planet.get_paths():
+            return planet.next_unexplored_direction(start)
+        frontier = self.frontier(planet)
+        if not frontier:
+            return None
+        open_nodes = set(frontier)
+        path = None
+        if self.tour and open_nodes == self.planned:
+            path = planet.shortest_path(start, self.tour[0])
+        if path is None:
+            self.tour = self.plan(planet, start, frontier)
+            self.planned = open_nodes
+            if not self.tour:
+                return None
+            path = planet.shortest_path(start, self.tour[0])
+        return self.direction_to(planet, start, path)
+
+    def plan(self, planet: Planet, start: Tuple[int, int], frontier: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """
+            Orders the reachable frontier nodes into a short open tour beginning at start.
+            :param planet: Planet
+            :param start: 2-Tuple, current coordinates
+            :param frontier: List[2-Tuple], nodes to visit
+            :return: List[2-Tuple], the frontier nodes in the order to visit them
+            """
+        start_tree = planet.shortest_path_tree(start)
+        targets = [node for node in frontier if start_tree.distance(node) is not None]
+        if not targets:
+            return []
+        nodes = [start] + [node for node in targets if node != start]
+        distances = self.distances(planet, nodes)
+        order = self.nearest_neighbour(distances)
+        order = self.two_opt(distances, order)
+        tour = [nodes[index] for index in order[1:]]
+        # an unexplored start is always finished first, it costs nothing to get there
+        if start in targets:
+            tour.insert(0, start)
+        return tour
+
+    def distances(self, planet: Planet, nodes: List[Tuple[int, int]]) -> List[List[float]]:
+        """
+            Returns the matrix of shortest path distances between nodes (inf if not reachable).
+            """
+        if self.use_distance_matrix:
+            return planet.distance_matrix().submatrix(nodes).tolist()
+        matrix = []
+        for node in nodes:
+            tree = pathfinding.ShortestPathTree(planet.get_traversable_paths(), node, planet.search_stats)
+            row = []
+            for other in nodes:
+                distance = tree.distance(other)
+                row.append(float('inf') if distance is None else distance)
+            matrix.append(row)
+        return matrix
+
+    def nearest_neighbour(self, distances: List[List[float]]) -> List[int]:
+        """
+            Builds an open tour from index 0 by always going to the closest index not visited yet.
+            """
+        order = [0]
+        remaining = set(range(1, len(distances)))
+        while remaining:
+            current = order[-1]
+            closest = min(remaining, key=lambda index: (distances[current][index], index))
+            order.append(closest)
+            remaining.remove(closest)
+        return order
+
+    def two_opt(self, distances: List[List[float]], order: List[int]) -> List[int]:
+        """
+            Reverses parts of the open tour as long as that makes it shorter. The first index stays in place.
+            """
+        order = list(order)
+        size = len(order)
+        for _ in range(self.max_two_opt_rounds):
+            improved = False
+            for i in range(size - 2):
+                a, b = order[i], order[i + 1]
+                for j in range(i + 2, size):
+                    c = order[j]
+                    if j + 1 < size:
+                        d = order[j + 1]
+                        delta = distances[a][c] + distances[b][d] - distances[a][b] - distances[c][d]
+                    else:
+                        delta = distances[a][c] - distances[a][b]
+                    if delta < 0:
+                        order[i + 1:j + 1] = reversed(order[i + 1:j + 1])
+                        a, b = order[i], order[i + 1]
+                        improved = True
+            if not improved:
+                break
+        return order
+
+    def tour_length(self, planet: Planet, start: Tuple[int, int]) -> Optional[float]:
+        """
+            :return: the planned driving distance of the current tour from start or None if there is no tour
+            """
+        if not self.tour:
+            return None
+        nodes = [start] + [node for node in self.tour if node != start]
+        distances = self.distances(planet, nodes)
+        return sum(distances[i][i + 1] for i in range(len(nodes) - 1))
+
+
+STRATEGIES: Dict[str, type] = {
+    'stack': StackStrategy,
+    'nearest': NearestFrontierStrategy,
+    'tour': TourStrategy,
+}
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+# Attention: Do not import the ev3dev.ev3 module in this file
+from collections import OrderedDict
+from typing import Tuple, Iterator
+
+
+class Frontier:
+    """
+    Stack of unexplored nodes with O(1) membership test, push, pop and removal of any node.
+    Every node is contained at most once. The top of the stack (index -1) is the node explored next.
+    """
+    def __init__(self, nodes=()):
+        """
+            Initializes the data structure
+            :param nodes: iterable of 2-Tuple, from bottom to top
+            """
+        self.nodes: 'OrderedDict[Tuple[int, int], None]' = OrderedDict()
+        for node in nodes:
+            self.append(node)
+
+    def append(self, node: Tuple[int, int]):
+        """
+            Pushes node on top of the stack. A node which is already contained moves to the top.
+            :param node: 2-Tuple
+            :return: void
+            """
+        self.nodes[node] = None
+        self.nodes.move_to_end(node)
+
+    def push_bottom(self, node: Tuple[int, int]):
+        """
+            Puts node at the bottom of the stack, unless it is already contained.
+            :param node: 2-Tuple
+            :return: void
+            """
+        if node not in self.nodes:
+            self.nodes[node] = None
+            self.nodes.move_to_end(node, last=False)
+
+    def pop(self) -> Tuple[int, int]:
+        """
+            Removes the node on top of the stack.
+            :return: 2-Tuple
+            """
+        if not self.nodes:
+            raise IndexError('pop from empty frontier')
+        return self.nodes.popitem()[0]
+
+    def discard(self, node: Tuple[int, int]):
+        """
+            Removes node wherever it is in the stack, if it is contained.
+            :param node: 2-Tuple
+            :return: void
+            """
+        self.nodes.pop(node, None)
+
+    def __getitem__(self, index: int) -> Tuple[int, int]:
+        """
+            Only the top (-1) and the bottom (0) of the stack can be accessed.
+            """
+        if not self.nodes:
+            raise IndexError('frontier is empty')
+        if index == -1:
+            return next(reversed(self.nodes))
+        if index == 0:
+            return next(iter(self.nodes))
+        raise IndexError('only the top (-1) and the bottom (0) of the frontier can be accessed')
+
+    def __contains__(self, node) -> bool:
+        return node in self.nodes
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        return iter(self.nodes)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def __repr__(self) -> str:
+        return repr(list(self.nodes))
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+# Attention: Do not import the ev3dev.ev3 module in this file
+import threading
+import time
+from collections import deque
+from queue import Queue
+from typing import Dict, Tuple
+
+
+class LatencyHistogram:
+    """
+    Rolling window of the latest latency samples of one kind, percentiles are computed when asked for.
+    """
+    def __init__(self, window: int = 1024):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.maximum = 0.0
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+        if seconds > self.maximum:
+            self.maximum = seconds
+
+    def summary(self) -> Dict:
+        """
+            :return: Dict with count, max and the nearest-rank percentiles p50, p95 and p99 of the window in seconds
+            """
+        ordered = sorted(self.samples)
+        summary = {'count': self.count, 'max': self.maximum}
+        for name, share in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+            summary[name] = ordered[min(len(ordered) - 1, max(0, round(share * len(ordered)) - 1))] if ordered else 0.0
+        return summary
+
+
+class LatencyTracer:
+    """
+    Latencies of the MQTT protocol per stage and message type:
+    round_trip from sending a message until the server's answer arrives (by the type of the answer),
+    decode from the arrival of a message in the MQTT thread until it is in the queue and
+    queue from there until the control loop takes it out.
+    """
+    STAGES = ('round_trip', 'decode', 'queue')
+
+    def __init__(self, window: int = 1024):
+        self.window = window
+        self.histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self.lock = threading.Lock()
+
+    def record(self, stage: str, message_type, seconds: float):
+        key = (stage, message_type or 'unknown')
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = LatencyHistogram(self.window)
+            histogram.add(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, Dict]]:
+        """
+            :return: Dict stage -> message type -> {count, p50, p95, p99, max} in seconds
+            """
+        with self.lock:
+            items = [(key, histogram.summary()) for key, histogram in self.histograms.items()]
+        summary = {}
+        for (stage, message_type), values in sorted(items):
+            summary.setdefault(stage, {})[message_type] = values
+        return summary
+
+    def report(self) -> str:
+        """
+            :return: String, table of the summary in milliseconds
+            """
+        lines = [f'{"stage":<11} {"type":<13} {"count":>6} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"max ms":>8}']
+        for stage, types in self.summary().items():
+            for message_type, values in types.items():
+                lines.append(f'{stage:<11} {message_type:<13} {values["count"]:>6} {values["p50"] * 1000:>8.2f} '
+                             f'{values["p95"] * 1000:>8.2f} {values["p99"] * 1000:>8.2f} {values["max"] * 1000:>8.2f}')
+        return '\n'.join(lines)
+
+
+class TracedQueue(Queue):
+    """
+    Queue of received messages which records for every message how long it waited in the queue.
+    """
+    def __init__(self, tracer: LatencyTracer):
+        super().__init__()
+        self.tracer = tracer
+
+    # _put and _get are called by Queue with its lock held
+    def _put(self, item):
+        self.queue.append((item, time.perf_counter()))
+
+    def _get(self):
+        item, enqueued = self.queue.popleft()
+        self.tracer.record('queue', getattr(item, 'type', None), time.perf_counter() - enqueued)
+        return item
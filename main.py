@@ -5,20 +5,23 @@ from queue import Queue
 from typing import Optional
 
 # Communication-Imports
-import ev3dev.ev3 as ev3
+# ev3dev, paho and movement (hardware) are only imported in run(), so that the simulator can drive this module
 import os
 import logging
-import paho.mqtt.client as mqtt
 import uuid
 import signal
 
 # Klassen-Imports
 from communication import Communication
-from movement import Movement
+import messages
+from exploration import StackStrategy
 from planet import Direction, Planet
+import robot_log
+import snapshot
 # from odometry import Odometry
 
 client = None  # DO NOT EDIT
+logger = robot_log.get_logger('main')
 # benötigte Variablen
 mission_completed = False
 target_queue = Queue()
@@ -50,12 +53,68 @@ current_orientation = Direction.NORTH
 has_commanded_direction = False
 communication = None
 test_mode = False
+planet_directory = None  # snapshots and journals of the planets, see snapshot.py
 planet = Planet()
-movement = Movement()
+movement = None  # Movement, or SimulatedMovement from simulator.py
+exploration_strategy = StackStrategy()  # or NearestFrontierStrategy() / TourStrategy() from exploration.py
+# Wartezeiten in Sekunden
+reply_timeout = 10  # nach so langem Warten auf die Antwort des Servers wird gewarnt und erneut gewartet
+reply_attempts = 3  # danach wird ohne Antwort mit den Nachrichten in der Queue weitergemacht
+path_select_window = 3  # der Simulator setzt es auf 0
+
+
+def reset(strategy=None):
+    """
+        Resets the state of the mission, so that run() can be called again (e.g. by the simulator).
+        :param strategy: ExplorationStrategy for the next mission, StackStrategy() if None
+        :return: void
+        """
+    global mission_completed, on_node, current_x, current_y, next_direction, unveiled_start_x, unveiled_start_y
+    global unveiled_start_direction, unveiled_end_x, unveiled_end_y, unveiled_end_direction, unveiled_path_status
+    global unveiled_path_weight, target_x, target_y, calculated_path, current_path_start_direction
+    global current_path_start_x, current_path_start_y, current_path_end_x, current_path_end_y
+    global current_path_end_direction, current_path_status, current_path_weight, current_orientation
+    global has_commanded_direction, communication, planet, exploration_strategy, target_queue
+    mission_completed = False
+    target_queue = Queue()
+    on_node = True
+    current_x = 0
+    current_y = 0
+    next_direction = Direction.NORTH
+    unveiled_start_x = 0
+    unveiled_start_y = 0
+    unveiled_start_direction = Direction.NORTH
+    unveiled_end_x = 0
+    unveiled_end_y = 0
+    unveiled_end_direction = Direction.NORTH
+    unveiled_path_status = "free"
+    unveiled_path_weight = 0
+    target_x = None
+    target_y = None
+    calculated_path = None
+    current_path_start_direction = Direction.NORTH
+    current_path_start_x = 0
+    current_path_start_y = 0
+    current_path_end_x = 0
+    current_path_end_y = 0
+    current_path_end_direction = Direction.SOUTH
+    current_path_status = "free"
+    current_path_weight = 0
+    current_orientation = Direction.NORTH
+    has_commanded_direction = False
+    communication = None
+    planet = Planet()
+    exploration_strategy = StackStrategy() if strategy is None else strategy
 
 
 # noinspection PyTypeChecker
-def run():
+def run(mqtt_client=None, movement_backend=None):
+    """
+        Runs a mission. Without arguments on the robot with the real MQTT client and motors.
+        :param mqtt_client: object with the interface of paho.mqtt.client.Client (see simulator.py) or None
+        :param movement_backend: object with the interface of Movement (see simulator.py) or None
+        :return: void
+        """
     # DO NOT CHANGE THESE VARIABLES
     #
     # The deploy-script uses the variable "client" to stop the mqtt-client after your program stops or crashes.
@@ -63,81 +122,88 @@ def run():
     global client, mission_completed, next_direction, on_node, has_commanded_direction
     global communication, planet, calculated_path, current_path_start_direction, current_path_end_direction
     global current_path_status, current_path_start_x, current_path_start_y, current_orientation, current_path_end_x
-    global current_path_end_y
-
-    client_id = '127-' + str(uuid.uuid4())  # Replace YOURGROUPID with your group ID
-    client = mqtt.Client(client_id=client_id,  # Unique Client-ID to recognize our program
-                         clean_session=True,  # We want a clean session after disconnect or abort/crash
-                         protocol=mqtt.MQTTv311)  # Define MQTT protocol version
-    # callback_api_version=mqtt.CallbackAPIVersion.VERSION2) muss hier raus, obwohl es als Fehler angezeigt wird bei macOS
-    # Setup logging directory and file
-    curr_dir = os.path.abspath(os.getcwd())
-    if not os.path.exists(curr_dir + '/../logs'):
-        os.makedirs(curr_dir + '/../logs')
-    log_file = curr_dir + '/../logs/project.log'
-    logging.basicConfig(filename=log_file,  # Define log file
-                        level=logging.DEBUG,  # Define default mode
-                        format='%(asctime)s: %(message)s'  # Define default logging format
-                        )
-    logger = logging.getLogger('RoboLab')
+    global current_path_end_y, planet_directory, movement
+
+    if mqtt_client is None:
+        import paho.mqtt.client as mqtt
+        client_id = '127-' + str(uuid.uuid4())  # Replace YOURGROUPID with your group ID
+        client = mqtt.Client(client_id=client_id,  # Unique Client-ID to recognize our program
+                             clean_session=True,  # We want a clean session after disconnect or abort/crash
+                             protocol=mqtt.MQTTv311)  # Define MQTT protocol version
+        # callback_api_version=mqtt.CallbackAPIVersion.VERSION2) muss hier raus, obwohl es als Fehler angezeigt wird bei macOS
+        # Setup logging directory and file
+        curr_dir = os.path.abspath(os.getcwd())
+        if not os.path.exists(curr_dir + '/../logs'):
+            os.makedirs(curr_dir + '/../logs')
+        log_file = curr_dir + '/../logs/project.log'
+        # Datei und Konsole werden von einem eigenen Thread geschrieben, Level pro Subsystem z.B. über
+        # ROBOLAB_LOG_LEVELS="planet=DEBUG,movement=WARNING"
+        robot_log.start_logging(log_file, level=logging.INFO, console_level=logging.INFO,
+                                levels={'communication': logging.DEBUG})
+        planet_directory = curr_dir + '/../planets'
+    else:
+        client = mqtt_client
+    if movement_backend is None:
+        from movement import Movement
+        movement = Movement()
+    else:
+        movement = movement_backend
     # THE EXECUTION OF ALL CODE SHALL BE STARTED FROM WITHIN THIS FUNCTION.
     # ADD YOUR OWN IMPLEMENTATION HEREAFTER.
-    communication = Communication(client, logger)
+    communication = Communication(client, robot_log.get_logger('communication'))
     movement.linefollow()
     if test_mode:
         communication.current_planet = input('Aktueller Planet:')
         communication.send_testplanet()
-        time.sleep(0.5)
-    communication.send_ready()
-    time.sleep(0.5)
+    wait_for_reply(communication.send_ready())
     analyze_messages(communication)
     try:
         while not mission_completed:
             if not movement.to_start_node:
                 if not movement.obstacle:
-                    communication.send_path(current_path_start_x, current_path_start_y, int(current_path_start_direction), current_x, current_y, int(current_path_end_direction), movement.current_path_status)
+                    reply = communication.send_path(current_path_start_x, current_path_start_y, int(current_path_start_direction), current_x, current_y, int(current_path_end_direction), movement.current_path_status)
                 else:
                     current_path_end_x = current_path_start_x
                     current_path_end_y = current_path_start_y
                     current_path_end_direction = (int(current_path_start_direction) - 180) % 360
-                    communication.send_path(current_path_start_x, current_path_start_y, int(current_path_start_direction), current_path_end_x, current_path_end_y, int(current_path_start_direction), movement.current_path_status)
-            time.sleep(0.5)
+                    reply = communication.send_path(current_path_start_x, current_path_start_y, int(current_path_start_direction), current_path_end_x, current_path_end_y, int(current_path_start_direction), movement.current_path_status)
+                # ohne die korrigierte path-Nachricht wären Position und Ausrichtung veraltet
+                wait_for_reply(reply)
             analyze_messages(communication)
-            print(planet.get_paths().keys())
+            logger.debug('bekannte Knoten: %s', planet.get_paths().keys())
             # schon bekannte Pfade dürften nicht hinzugefügt werden, das müsste hier geprüft werden
             if (current_x, current_y) not in planet.visited_nodes.keys():
                 directions_list = planet.check_paths((current_x, current_y), list(movement.node_scan(current_orientation)))
                 planet.add_directions((current_x, current_y), directions_list)
-                planet.visited_nodes[(current_x, current_y)] = True
-                print(planet.visited_nodes.keys())
-            next_direction = planet.next_unexplored_node_and_direction((current_x, current_y))
+                planet.mark_visited((current_x, current_y))
+                logger.debug('besuchte Knoten: %s', planet.visited_nodes.keys())
+            next_direction = exploration_strategy.next_direction(planet, (current_x, current_y))
             if next_direction is None:
                 movement.tetris()
                 break
+            communication.open_window()
             communication.send_pathselect(current_x, current_y, int(next_direction))
-            start_time = time.time()
-            while True:
-                current_time = time.time()
+            # warten bis das Fenster des Servers vorbei ist oder er einen Pfad vorgibt
+            deadline = time.monotonic() + path_select_window
+            while communication.wait_for_message(deadline - time.monotonic()):
                 analyze_messages(communication)
-                if (current_time - start_time) > 3:
-                    print('3 sek vergangen')
-                    break
-            ev3.Sound.beep()
+            movement.beep()
             if not has_commanded_direction:
                 if target_reachable():  # Zielmodus
                     if (current_x, current_y) == (target_x, target_y):
-                        print('1130')
+                        logger.debug('1130')
                         movement.tetris()
                         break
-                    print('1110')
-                    calculated_path = planet.shortest_path((current_x, current_y), (target_x, target_y))
-                    print(calculated_path)
+                    logger.debug('1110')
+                    calculated_path = planet.shortest_path((current_x, current_y), (target_x, target_y),
+                                                           heading=current_orientation)
+                    logger.debug('calculated_path: %s', calculated_path)
                     try:
                         next_direction = calculated_path[0][1]
                     except TypeError:
-                        print(calculated_path)
+                        logger.warning('kein Pfad zum Ziel: %s', calculated_path)
                 else:  # Erkundungsmodus
-                    next_direction = planet.next_unexplored_node_and_direction((current_x, current_y))
+                    next_direction = exploration_strategy.next_direction(planet, (current_x, current_y))
                     # print('1117')
                     if next_direction is None:
                         movement.tetris()
@@ -145,11 +211,10 @@ def run():
             # vor dem Turn
             planet.update_certain(next_direction, (current_x, current_y))
             has_commanded_direction = False
-            print(f'next_direction: {next_direction}')
+            logger.info('next_direction: %s', next_direction)
             if not movement.to_start_node:
-                print(current_path_end_direction)
                 current_orientation = (int(current_path_end_direction) + 180) % 360
-                print(current_orientation)
+                logger.debug('current_path_end_direction: %s, current_orientation: %s', current_path_end_direction, current_orientation)
             current_path_start_direction = next_direction
             current_path_start_x = current_x
             current_path_start_y = current_y
@@ -158,9 +223,33 @@ def run():
             current_path_status = movement.linefollow()
             movement.to_start_node = False
     finally:
+        if communication.current_planet and planet_directory is not None:
+            snapshot.checkpoint(planet, communication.current_planet, planet_directory)
         client.loop_stop()
         client.disconnect()
-        print("Verbindung wird geschlossen, Programm wird beendet!")
+        logger.info('Latenzen der Kommunikation:\n%s', communication.tracer.report())
+        logger.info("Verbindung wird geschlossen, Programm wird beendet!")
+        if mqtt_client is None:
+            robot_log.stop_logging()
+
+
+def wait_for_reply(reply):
+    """
+        Waits for the answer of the server to a sent message. A slow server gets reply_attempts times reply_timeout,
+        after that an error is logged, the Reply is cancelled and the mission goes on with whatever is in the queue
+        (like the fixed sleep before the Replies did), a late answer is still handled by the next analyze_messages.
+        :param reply: communication.Reply
+        :return: messages.Message or None if the server did not answer in time
+        """
+    for attempt in range(1, reply_attempts + 1):
+        try:
+            return reply.result(reply_timeout)
+        except TimeoutError:
+            logger.warning('Keine %s-Antwort vom Server nach %s s (Versuch %s/%s)', reply.message_type,
+                           attempt * reply_timeout, attempt, reply_attempts)
+    logger.error('Server hat nicht auf %s geantwortet, es wird ohne Antwort weitergemacht', reply.message_type)
+    communication.cancel_reply(reply)
+    return None
 
 
 # noinspection PyTypeChecker
@@ -173,7 +262,7 @@ def target_reachable():
     if target_x is not None and target_y is not None:
         calculated_path = planet.shortest_path((current_x, current_y), (target_x, target_y))
         if calculated_path is None:
-            print('target ist noch nicht erkundet worden.')
+            logger.info('target ist noch nicht erkundet worden.')
             return False
         else:  # wenn Ziel erreichbar
             return True
@@ -184,68 +273,94 @@ def target_reachable():
 # noinspection PyTypeChecker
 def analyze_messages(comm):
     """
-        Checks the incoming messages and if necessary, sends messages back via the communication.py class
+        Checks the incoming messages and hands each one to its handler in MESSAGE_HANDLERS
         :param comm: Communication() Class instance
         :return: void
         """
-    global current_x, current_y, unveiled_start_x
-    global unveiled_start_y, unveiled_start_direction, unveiled_end_x, unveiled_end_y, unveiled_end_direction
-    global unveiled_path_status, unveiled_path_weight, target_x, target_y, mission_completed, next_direction
-    global current_path_start_x, current_path_start_y, current_path_start_direction, current_path_end_x
-    global current_path_end_y, current_path_end_direction, current_path_weight, current_path_status
-    global planet, has_commanded_direction, current_orientation
-    while comm.q.qsize() > 0:
-        received_message = comm.q.get()
-        if received_message['from'] == 'server' and received_message['type'] == 'planet':
-            current_x, current_y, current_orientation = comm.receive_ready(received_message)
-            current_orientation = planet.convert_direction(current_orientation)
-        elif received_message['from'] == 'server' and received_message['type'] == 'path':
-            current_path_start_x, current_path_start_y, current_path_start_direction, current_x, current_y, current_path_end_direction, current_path_status, current_path_weight = comm.receive_path(received_message)
-            current_orientation = planet.convert_direction(int(current_path_end_direction - 180) % 360)
-            planet.add_path(((current_path_start_x, current_path_start_y), planet.convert_direction(current_path_start_direction)),
-                            ((current_x, current_y), planet.convert_direction(current_path_end_direction)), current_path_weight)
-            print('path-Nachricht eingelesen.')
-        elif received_message['from'] == 'server' and received_message['type'] == 'pathSelect':
-            has_commanded_direction = True
-            next_direction = comm.receive_pathselect(received_message)
-            print('pathSelect-Nachricht eingelesen.')
-        elif received_message['from'] == 'server' and received_message['type'] == 'pathUnveiled':
-            unveiled_start_x, unveiled_start_y, unveiled_start_direction, unveiled_end_x, unveiled_end_y, unveiled_end_direction, unveiled_path_status, unveiled_path_weight = comm.receive_pathunveiled(received_message)
-            print(unveiled_path_status)
-            if (unveiled_start_x, unveiled_start_y) not in planet.unexplored_nodes:
-                planet.unexplored_nodes.insert(0, (unveiled_start_x, unveiled_start_y))
-            if (unveiled_end_x, unveiled_end_y) not in planet.unexplored_nodes:
-                planet.unexplored_nodes.insert(0, (unveiled_end_x, unveiled_end_y))
-            if unveiled_path_status == "free":
-                planet.add_path(((unveiled_start_x, unveiled_start_y), planet.convert_direction(unveiled_start_direction)), ((unveiled_end_x, unveiled_end_y), planet.convert_direction(unveiled_end_direction)), unveiled_path_weight)
-                planet.update_direction((unveiled_start_x, unveiled_start_y), [planet.convert_direction(unveiled_start_direction)])
-                planet.update_direction((unveiled_end_x, unveiled_end_y), [planet.convert_direction(unveiled_end_direction)])
-                if (current_path_start_x, current_path_start_y) in planet.visited_nodes.keys():
-                    planet.pop_from_stack((current_path_start_x, current_path_start_y))
-                if (current_path_end_x, current_path_end_y) in planet.visited_nodes.keys():
-                    planet.pop_from_stack((current_path_end_x, current_path_end_y))
-            elif unveiled_path_status == "blocked":
-                planet.add_path(((unveiled_start_x, unveiled_start_y), planet.convert_direction(unveiled_start_direction)), ((unveiled_end_x, unveiled_end_y), planet.convert_direction(unveiled_end_direction)), unveiled_path_weight)
-                planet.update_direction((unveiled_start_x, unveiled_start_y), [planet.convert_direction(unveiled_start_direction)])
-                planet.update_direction((unveiled_end_x, unveiled_end_y), [planet.convert_direction(unveiled_end_direction)])
-                if (current_path_start_x, current_path_start_y) in planet.visited_nodes.keys():
-                    planet.pop_from_stack((current_path_start_x, current_path_start_y))
-                if (current_path_end_x, current_path_end_y) in planet.visited_nodes.keys():
-                    planet.pop_from_stack((current_path_end_x, current_path_end_y))
-            else:
-                print('fehler bei pathUnveiled-Nachricht: der Status entspricht nicht \"free\"|\"blocked\".')
-            print('pathUnveiled-Nachricht eingelesen.')
-        elif received_message['from'] == 'server' and received_message['type'] == 'target':
-            target_x, target_y = comm.receive_target(received_message)
-            print('target-Nachricht eingelesen.')
-        elif received_message['from'] == 'server' and received_message['type'] == 'done':
-            completion_message = comm.receive_complete(received_message)
-            print(f'completion-Nachricht eingelesen: {completion_message}')
-            mission_completed = True
-        elif received_message['from'] == 'debug':
-            pass
-        else:
-            print(f'Fehler in Analyse von Nachrichten: Falscher Nachrichtentyp. Entspricht nicht \"testplanet\", \"ready\", usw:\n\n{received_message}')
+    # the paths unveiled by one burst of messages invalidate the cached searches only once
+    with planet.batch():
+        while comm.q.qsize() > 0:
+            received_message = comm.q.get()
+            handler = MESSAGE_HANDLERS.get(type(received_message))
+            if handler is not None:
+                handler(comm, received_message)
+            elif received_message.sender != 'debug':
+                logger.error('Fehler in Analyse von Nachrichten: Falscher Nachrichtentyp. Entspricht nicht \"testplanet\", \"ready\", usw:\n\n%s', received_message)
+
+
+def handle_planet(comm, message: messages.PlanetMessage):
+    global current_x, current_y, current_orientation, planet
+    current_x, current_y, current_orientation = comm.receive_ready(message)
+    if planet_directory is not None:
+        # a planet which was visited before (or before a crash) is restored instead of learned again
+        planet = snapshot.open_planet(comm.current_planet, planet_directory)
+
+
+def handle_path(comm, message: messages.PathMessage):
+    global current_x, current_y, current_path_start_x, current_path_start_y, current_path_start_direction
+    global current_path_end_direction, current_path_status, current_path_weight, current_orientation
+    current_path_start_x, current_path_start_y = message.start
+    current_path_start_direction = message.start_direction
+    current_x, current_y = message.end
+    current_path_end_direction = message.end_direction
+    current_path_status = message.status
+    current_path_weight = message.weight
+    current_orientation = Direction((message.end_direction + 180) % 360)
+    planet.add_path((message.start, message.start_direction), (message.end, message.end_direction), message.weight)
+    logger.debug('path-Nachricht eingelesen.')
+
+
+def handle_pathselect(comm, message: messages.PathSelectMessage):
+    global has_commanded_direction, next_direction
+    has_commanded_direction = True
+    next_direction = message.start_direction
+    logger.info('pathSelect-Nachricht eingelesen.')
+
+
+def handle_pathunveiled(comm, message: messages.PathUnveiledMessage):
+    global unveiled_start_x, unveiled_start_y, unveiled_start_direction, unveiled_end_x, unveiled_end_y
+    global unveiled_end_direction, unveiled_path_status, unveiled_path_weight
+    unveiled_start_x, unveiled_start_y = message.start
+    unveiled_start_direction = message.start_direction
+    unveiled_end_x, unveiled_end_y = message.end
+    unveiled_end_direction = message.end_direction
+    unveiled_path_status = message.status
+    unveiled_path_weight = message.weight
+    planet.push_unexplored(message.start)
+    planet.push_unexplored(message.end)
+    if unveiled_path_status in ("free", "blocked"):
+        planet.add_path((message.start, message.start_direction), (message.end, message.end_direction), message.weight)
+        planet.update_direction(message.start, [message.start_direction])
+        planet.update_direction(message.end, [message.end_direction])
+        if (current_path_start_x, current_path_start_y) in planet.visited_nodes.keys():
+            planet.pop_from_stack((current_path_start_x, current_path_start_y))
+        if (current_path_end_x, current_path_end_y) in planet.visited_nodes.keys():
+            planet.pop_from_stack((current_path_end_x, current_path_end_y))
+    else:
+        logger.error('fehler bei pathUnveiled-Nachricht: der Status entspricht nicht \"free\"|\"blocked\".')
+    logger.debug('pathUnveiled-Nachricht eingelesen (%s).', unveiled_path_status)
+
+
+def handle_target(comm, message: messages.TargetMessage):
+    global target_x, target_y
+    target_x, target_y = message.target
+    logger.info('target-Nachricht eingelesen.')
+
+
+def handle_done(comm, message: messages.DoneMessage):
+    global mission_completed
+    logger.info('completion-Nachricht eingelesen: %s', message.message)
+    mission_completed = True
+
+
+MESSAGE_HANDLERS = {
+    messages.PlanetMessage: handle_planet,
+    messages.PathMessage: handle_path,
+    messages.PathSelectMessage: handle_pathselect,
+    messages.PathUnveiledMessage: handle_pathunveiled,
+    messages.TargetMessage: handle_target,
+    messages.DoneMessage: handle_done,
+}
 
 
 # DO NOT EDIT
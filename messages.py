@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+
+# Attention: Do not import the ev3dev.ev3 module in this file
+import json
+from typing import Tuple, Dict, Optional
+
+from planet import Direction
+
+
+class Message:
+    """
+    Message received over MQTT, decoded once by decode(). The server messages have their own classes with
+    coordinates as 2-Tuples and directions as Direction, every other message is a RawMessage.
+    """
+    __slots__ = ()
+    sender = 'server'
+    type: Optional[str] = None
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for cls in type(self).__mro__
+                           for name in getattr(cls, '__slots__', ()))
+        return f'{type(self).__name__}({fields})'
+
+
+class RawMessage(Message):
+    """
+    Message which is not from the server (debug messages and the echo of our own ones) or of an unknown type.
+    """
+    __slots__ = ('sender', 'type', 'payload')
+
+    def __init__(self, sender: str, message_type: str, payload: Optional[Dict]):
+        self.sender = sender
+        self.type = message_type
+        self.payload = payload
+
+
+class PlanetMessage(Message):
+    """
+    Answer to ready: the planet and the start node.
+    """
+    __slots__ = ('planet_name', 'start', 'start_orientation')
+    type = 'planet'
+
+    def __init__(self, planet_name: str, start: Tuple[int, int], start_orientation: Direction):
+        self.planet_name = planet_name
+        self.start = start
+        self.start_orientation = start_orientation
+
+    @classmethod
+    def from_payload(cls, payload: Dict) -> 'PlanetMessage':
+        return cls(payload['planetName'], (payload['startX'], payload['startY']),
+                   Direction(payload['startOrientation']))
+
+
+class PathMessage(Message):
+    """
+    Answer to path: the driven path as the server knows it, with the corrected end and the weight.
+    """
+    __slots__ = ('start', 'start_direction', 'end', 'end_direction', 'status', 'weight')
+    type = 'path'
+
+    def __init__(self, start: Tuple[int, int], start_direction: Direction, end: Tuple[int, int],
+                 end_direction: Direction, status: str, weight: int):
+        self.start = start
+        self.start_direction = start_direction
+        self.end = end
+        self.end_direction = end_direction
+        self.status = status
+        self.weight = weight
+
+    @classmethod
+    def from_payload(cls, payload: Dict) -> 'PathMessage':
+        return cls((payload['startX'], payload['startY']), Direction(payload['startDirection']),
+                   (payload['endX'], payload['endY']), Direction(payload['endDirection']),
+                   str(payload['pathStatus']), payload['pathWeight'])
+
+
+class PathUnveiledMessage(PathMessage):
+    """
+    A path the robot has not driven, unveiled by the server.
+    """
+    __slots__ = ()
+    type = 'pathUnveiled'
+
+
+class PathSelectMessage(Message):
+    """
+    The server chose the next path instead of the robot.
+    """
+    __slots__ = ('start_direction',)
+    type = 'pathSelect'
+
+    def __init__(self, start_direction: Direction):
+        self.start_direction = start_direction
+
+    @classmethod
+    def from_payload(cls, payload: Dict) -> 'PathSelectMessage':
+        return cls(Direction(payload['startDirection']))
+
+
+class TargetMessage(Message):
+    __slots__ = ('target',)
+    type = 'target'
+
+    def __init__(self, target: Tuple[int, int]):
+        self.target = target
+
+    @classmethod
+    def from_payload(cls, payload: Dict) -> 'TargetMessage':
+        return cls((payload['targetX'], payload['targetY']))
+
+
+class DoneMessage(Message):
+    """
+    Answer to targetReached and explorationCompleted, the mission is over.
+    """
+    __slots__ = ('message',)
+    type = 'done'
+
+    def __init__(self, message: str):
+        self.message = message
+
+    @classmethod
+    def from_payload(cls, payload: Dict) -> 'DoneMessage':
+        return cls(payload['message'])
+
+
+SERVER_MESSAGES = {cls.type: cls for cls in (PlanetMessage, PathMessage, PathUnveiledMessage, PathSelectMessage,
+                                             TargetMessage, DoneMessage)}
+
+
+def decode(payload) -> Message:
+    """
+        Decodes the payload of an MQTT message.
+        :param payload: bytes or String, encoded JSON
+        :return: Message, one of the server message classes or a RawMessage
+        """
+    data = json.loads(payload)
+    sender, message_type = data.get('from'), data.get('type')
+    cls = SERVER_MESSAGES.get(message_type) if sender == 'server' else None
+    if cls is None:
+        return RawMessage(sender, message_type, data.get('payload'))
+    return cls.from_payload(data['payload'])
+
+
+# outbound: byte templates of the client messages, only the fields are formatted per send
+_TEST_PLANET = b'{"from":"client","type":"testPlanet","payload":{"planetName":%s}}'
+READY = b'{"from":"client","type":"ready"}'
+_PATH = b'{"from":"client","type":"path","payload":{"startX":%d,"startY":%d,"startDirection":%d,' \
+        b'"endX":%d,"endY":%d,"endDirection":%d,"pathStatus":%s}}'
+_PATH_SELECT = b'{"from":"client","type":"pathSelect","payload":{"startX":%d,"startY":%d,"startDirection":%d}}'
+_TARGET_REACHED = b'{"from":"client","type":"targetReached","payload":{"message":%s}}'
+_EXPLORATION_COMPLETED = b'{"from":"client","type":"explorationCompleted","payload":{"message":%s}}'
+_PATH_STATUS = {'free': b'"free"', 'blocked': b'"blocked"'}
+
+
+def encode_string(value) -> bytes:
+    """
+        :return: bytes, value as JSON string with quotes, backslashes and control characters escaped
+        """
+    return json.dumps(str(value)).encode('ascii')
+
+
+def encode_test_planet(planet_name: str) -> bytes:
+    return _TEST_PLANET % encode_string(planet_name)
+
+
+def encode_path(start_x: int, start_y: int, start_direction: int, end_x: int, end_y: int, end_direction: int,
+                path_status: str) -> bytes:
+    status = _PATH_STATUS.get(path_status) or encode_string(path_status)
+    return _PATH % (start_x, start_y, start_direction, end_x, end_y, end_direction, status)
+
+
+def encode_path_select(x: int, y: int, start_direction: int) -> bytes:
+    return _PATH_SELECT % (x, y, start_direction)
+
+
+def encode_target_reached(message: str) -> bytes:
+    return _TARGET_REACHED % encode_string(message)
+
+
+def encode_exploration_completed(message: str) -> bytes:
+    return _EXPLORATION_COMPLETED % encode_string(message)
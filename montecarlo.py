@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+
+# Attention: Do not import the ev3dev.ev3 module in this file
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple, Dict, Optional
+
+from exploration import ExplorationStrategy, STRATEGIES
+from planet import Direction, Planet
+from planet_generator import generate_planet
+import simulator
+
+
+class TimedStrategy(ExplorationStrategy):
+    """
+    Wraps a strategy and adds up the CPU time spent in its next_direction calls.
+    """
+    def __init__(self, strategy: ExplorationStrategy):
+        self.strategy = strategy
+        self.cpu_seconds = 0.0
+        self.calls = 0
+
+    def next_direction(self, planet: Planet, start: Tuple[int, int]) -> Optional[Direction]:
+        start_time = time.process_time()
+        try:
+            return self.strategy.next_direction(planet, start)
+        finally:
+            self.cpu_seconds += time.process_time() - start_time
+            self.calls += 1
+
+
+def run_one(task: Tuple[str, int, int, Dict]) -> Dict:
+    """
+        Runs one simulated mission, in a worker process of the pool.
+        :param task: (strategy name, nodes, seed, keyword arguments for simulator.run_mission)
+        :return: Dict, MissionResult.as_dict() with strategy, planning_cpu_seconds and planning_calls added
+        """
+    name, nodes, seed, options = task
+    ground_truth = generate_planet(nodes, seed)
+    options = dict(options)
+    if options.pop('with_target', False):
+        options['target'] = ground_truth.nodes[seed % len(ground_truth.nodes)]
+    strategy = TimedStrategy(STRATEGIES[name]())
+    try:
+        result = simulator.run_mission(ground_truth, strategy, seed=seed, **options).as_dict()
+    except Exception as e:
+        # a crash of main.py is a failed mission, not a failed evaluation
+        result = simulator.MissionResult(ground_truth.name, nodes, seed).as_dict()
+        result['error'] = f'{type(e).__name__}: {e}'
+    result['strategy'] = name
+    result['planning_cpu_seconds'] = strategy.cpu_seconds
+    result['planning_calls'] = strategy.calls
+    return result
+
+
+def _summary(values: List[float]) -> Dict:
+    if not values:
+        return {'mean': None, 'p50': None, 'p95': None}
+    ordered = sorted(values)
+    return {'mean': statistics.fmean(ordered), 'p50': ordered[len(ordered) // 2],
+            'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]}
+
+
+def aggregate(results: List[Dict]) -> Dict[str, Dict]:
+    """
+        Sums up the missions per strategy. Driven weight and node visits only count completed missions,
+        failed ones (aborted, crashed or ended with paths left to explore) make up the failure rate.
+        :param results: List of run_one() results
+        :return: Dict strategy name -> statistics
+        """
+    by_strategy: Dict[str, List[Dict]] = {}
+    for result in results:
+        by_strategy.setdefault(result['strategy'], []).append(result)
+    summary = {}
+    for name, missions in by_strategy.items():
+        completed = [mission for mission in missions if mission['completed']]
+        summary[name] = {
+            'missions': len(missions),
+            'failures': len(missions) - len(completed),
+            'failure_rate': (len(missions) - len(completed)) / len(missions),
+            'weight_driven': _summary([mission['weight_driven'] for mission in completed]),
+            'node_visits': _summary([mission['node_visits'] for mission in completed]),
+            'planning_cpu_seconds': _summary([mission['planning_cpu_seconds'] for mission in missions]),
+            'planning_cpu_seconds_total': sum(mission['planning_cpu_seconds'] for mission in missions),
+        }
+    return summary
+
+
+def evaluate(strategies: List[str], missions: int, sizes: List[int], seed: int = 0, workers: Optional[int] = None,
+             **options) -> List[Dict]:
+    """
+        Runs missions seeded missions for each strategy on a process pool. All strategies drive on the same planets,
+        mission i uses seed + i and the size sizes[i % len(sizes)].
+        :param strategies: List of names of exploration.STRATEGIES
+        :param missions: Integer, missions per strategy
+        :param sizes: List of node counts
+        :param seed: Integer, seed of the first mission
+        :param workers: Integer, processes of the pool, default os.cpu_count()
+        :param options: keyword arguments for simulator.run_mission, with_target=True gives every mission a target
+        :return: List of run_one() results
+        """
+    tasks = [(name, sizes[i % len(sizes)], seed + i, options) for i in range(missions) for name in strategies]
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run_one, tasks, chunksize=max(1, len(tasks) // (workers * 8))))
+
+
+def print_table(summary: Dict[str, Dict]):
+    print(f'{"strategy":<10} {"missions":>8} {"failed":>7} {"weight":>9} {"weight p95":>10} {"visits":>8} '
+          f'{"plan ms":>9} {"plan p95":>9}')
+    for name, stats in sorted(summary.items(), key=lambda item: (item[1]['failure_rate'],
+                                                                  item[1]['weight_driven']['mean'] or 0)):
+        weight, visits, planning = stats['weight_driven'], stats['node_visits'], stats['planning_cpu_seconds']
+        print(f'{name:<10} {stats["missions"]:>8} {stats["failure_rate"]:>7.1%} '
+              f'{weight["mean"] or 0:>9.1f} {weight["p95"] or 0:>10} {visits["mean"] or 0:>8.1f} '
+              f'{planning["mean"] * 1000:>9.2f} {planning["p95"] * 1000:>9.2f}')
+
+
+def main(arguments: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Monte-Carlo comparison of the exploration strategies')
+    parser.add_argument('--strategies', nargs='+', default=list(STRATEGIES), choices=list(STRATEGIES))
+    parser.add_argument('--missions', type=int, default=1000, help='missions per strategy')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 25, 50, 100])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--unveil-rate', type=float, default=0.0)
+    parser.add_argument('--override-rate', type=float, default=0.0)
+    parser.add_argument('--targets', action='store_true', help='send every mission a target')
+    parser.add_argument('--output', help='JSON file with the summary and every mission')
+    args = parser.parse_args(arguments)
+
+    start_time = time.perf_counter()
+    results = evaluate(args.strategies, args.missions, args.sizes, args.seed, args.workers,
+                       unveil_rate=args.unveil_rate, override_rate=args.override_rate, with_target=args.targets)
+    summary = aggregate(results)
+    print_table(summary)
+    print(f'{len(results)} missions in {time.perf_counter() - start_time:.1f} s')
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'summary': summary, 'missions': results}, file, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,5 @@
 # EV3 Imports
+import logging
 import math
 
 import ev3dev.ev3 as ev3
@@ -6,10 +7,13 @@ from ev3dev.ev3 import Button
 
 from planet import Planet
 from odometry import Odometry
+import robot_log
 
 import time
 import json
 
+logger = robot_log.get_logger('movement')
+
 
 class Movement:
     """
@@ -156,12 +160,15 @@ class Movement:
             if self.lm.position >= 1245 and self.cs.red <= 80 and self.cs.blue <= 80:  # 913
                 self.lm.stop()
                 self.rm.stop()
-                print(f'node scan mit linienerkennung - motorposition: {self.lm.position}, und farben - rot: {self.cs.red} und blau: {self.cs.blue}')
+                # die Sensoren werden nur ausgelesen, wenn debug-Logging an ist
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug('node scan mit linienerkennung - motorposition: %s, und farben - rot: %s und blau: %s', self.lm.position, self.cs.red, self.cs.blue)
                 break
             elif self.lm.position >= 1330:
                 self.lm.stop()
                 self.rm.stop()
-                print(f'node scan mit motorposition - motorposition: {self.lm.position}')
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug('node scan mit motorposition - motorposition: %s', self.lm.position)
                 break
         return unvisited_directions_list
 
@@ -222,6 +229,13 @@ class Movement:
                         self.rm.stop()
                         break
 
+    def beep(self):
+        """
+            Short beep, e.g. after the path selection.
+            :return: void
+            """
+        ev3.Sound.beep()
+
     def tetris(self):
         """
             Method which plays the original tetris theme in 8-bit version with full volume as it should be.
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+# Attention: Do not import the ev3dev.ev3 module in this file
+from array import array
+from typing import List, Tuple, Dict, Iterable, Iterator, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from planet import Direction
+
+
+# Every node owns one 32 bit word:
+#   bits  0- 3  known        directions with a path (free or blocked) in the planet
+#   bits  4- 7  undiscovered directions found by a node scan which still have to be explored
+#   bits  8-11  blocked      directions with a blocked path
+#   bits 12-15  visited      directions the robot has left the node in
+#   bit     16  scanned      the node has been scanned (add_directions was called)
+#   bits 17-19  count        number of directions in the scan order
+#   bits 20-27  scan order   2 bits per direction, in the order add_directions received them
+# Bit 0 of every mask is NORTH, bit 1 EAST, bit 2 SOUTH and bit 3 WEST.
+KNOWN = 0
+UNDISCOVERED = 4
+BLOCKED = 8
+VISITED = 12
+SCANNED = 1 << 16
+
+
+def direction_mask(directions: Iterable['Direction']) -> int:
+    """
+        Packs directions into a 4 bit mask.
+        :param directions: iterable of Direction
+        :return: Integer
+        """
+    mask = 0
+    for direction in directions:
+        mask |= 1 << (int(direction) // 90)
+    return mask
+
+
+def mask_directions(mask: int) -> List['Direction']:
+    """
+        Unpacks a 4 bit mask into a list of Direction, from NORTH to WEST.
+        :param mask: Integer
+        :return: List[Direction]
+        """
+    from planet import Direction
+    return [direction for index, direction in enumerate(Direction) if mask >> index & 1]
+
+
+class NodeStates:
+    """
+    Direction state of all nodes of a planet, packed into one array of 32 bit words (see above)
+    """
+    def __init__(self):
+        """ Initializes the data structure """
+        self.ids: Dict[Tuple[int, int], int] = {}
+        self.nodes: List[Tuple[int, int]] = []
+        self.words = array('I')
+
+    def __contains__(self, node: Tuple[int, int]) -> bool:
+        return node in self.ids
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        return iter(self.nodes)
+
+    def word(self, node: Tuple[int, int]) -> int:
+        """
+            :param node: 2-Tuple
+            :return: Integer, the state word of node (0 if the node is unknown)
+            """
+        node_id = self.ids.get(node)
+        return 0 if node_id is None else self.words[node_id]
+
+    def mask(self, node: Tuple[int, int], field: int) -> int:
+        """
+            :param node: 2-Tuple
+            :param field: KNOWN, UNDISCOVERED, BLOCKED or VISITED
+            :return: Integer, the 4 bit mask of the field
+            """
+        return self.word(node) >> field & 15
+
+    def is_scanned(self, node: Tuple[int, int]) -> bool:
+        return bool(self.word(node) & SCANNED)
+
+    def set_bits(self, node: Tuple[int, int], field: int, mask: int):
+        """
+            Sets the directions of mask in a field of node.
+            :return: void
+            """
+        node_id = self._intern(node)
+        self.words[node_id] |= mask << field
+
+    def clear_bits(self, node: Tuple[int, int], field: int, mask: int):
+        """
+            Clears the directions of mask in a field of node.
+            :return: void
+            """
+        node_id = self.ids.get(node)
+        if node_id is not None:
+            self.words[node_id] &= ~(mask << field) & 0xFFFFFFFF
+
+    def scan(self, node: Tuple[int, int], directions: Iterable['Direction']):
+        """
+            Marks node as scanned and adds directions to its undiscovered directions and its scan order.
+            :param node: 2-Tuple
+            :param directions: iterable of Direction
+            :return: void
+            """
+        node_id = self._intern(node)
+        word = self.words[node_id] | SCANNED
+        for direction in directions:
+            index = int(direction) // 90
+            count = word >> 17 & 7
+            if all(word >> (20 + 2 * position) & 3 != index for position in range(count)):
+                word += (1 << 17) + (index << (20 + 2 * count))
+            word |= 1 << (UNDISCOVERED + index)
+        self.words[node_id] = word
+
+    def undiscovered(self, node: Tuple[int, int]) -> List['Direction']:
+        """
+            Returns the undiscovered directions of node in the order in which they were scanned.
+            :param node: 2-Tuple
+            :return: List[Direction]
+            """
+        from planet import Direction
+        word = self.word(node)
+        directions = []
+        for position in range(word >> 17 & 7):
+            index = word >> (20 + 2 * position) & 3
+            if word >> (UNDISCOVERED + index) & 1:
+                directions.append(Direction(index * 90))
+        return directions
+
+    def snapshot(self) -> Tuple[List[Tuple[int, int]], array]:
+        """
+            :return: (nodes, copy of the state words), the i-th word belongs to the i-th node
+            """
+        return list(self.nodes), array('I', self.words)
+
+    def _intern(self, node: Tuple[int, int]) -> int:
+        node_id = self.ids.get(node)
+        if node_id is None:
+            node_id = self.ids[node] = len(self.nodes)
+            self.nodes.append(node)
+            self.words.append(0)
+        return node_id
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+
+# Attention: Do not import the ev3dev.ev3 module in this file
+from array import array
+from collections.abc import Mapping
+from typing import List, Tuple, Dict, Optional, Iterator, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from planet import Direction
+
+
+class DictPathStore:
+    """
+    Stores the paths of a planet as dict of dicts, exactly in the format returned by Planet.get_paths().
+    The traversable paths (weight != -1) are kept in a second dict of dicts with the same order and the blocked
+    ones in an index of their own, both updated by set_path.
+    """
+    def __init__(self):
+        """ Initializes the data structure """
+        self.paths: Dict[Tuple[int, int], Dict['Direction', Tuple[Tuple[int, int], 'Direction', int]]] = {}
+        self.free: Dict[Tuple[int, int], Dict['Direction', Tuple[Tuple[int, int], 'Direction', int]]] = {}
+        self.blocked: Dict[Tuple[int, int], Dict['Direction', Tuple[Tuple[int, int], 'Direction']]] = {}
+
+    def set_path(self, node: Tuple[int, int], direction: 'Direction', target: Tuple[int, int],
+                 target_direction: 'Direction', weight: int) -> Optional[Tuple[Tuple[int, int], 'Direction', int]]:
+        """
+            Sets the outgoing path of node in direction.
+            :param node: 2-Tuple
+            :param direction: Direction
+            :param target: 2-Tuple, end of the path
+            :param target_direction: Direction, direction of the path at its end
+            :param weight: Integer
+            :return: (2-Tuple, Direction, weight) which was replaced or None
+            """
+        node_paths = self.paths.get(node)
+        if node_paths is None:
+            node_paths = self.paths[node] = {}
+            self.free[node] = {}
+        old_path = node_paths.get(direction)
+        if old_path is None or old_path != (target, target_direction, weight):
+            node_paths[direction] = (target, target_direction, weight)
+            # rebuilt from node_paths (at most four entries) to keep the order of the directions
+            self.free[node] = {key: path for key, path in node_paths.items() if path[2] != -1}
+            if weight == -1:
+                self.blocked.setdefault(node, {})[direction] = (target, target_direction)
+            elif node in self.blocked:
+                self.blocked[node].pop(direction, None)
+                if not self.blocked[node]:
+                    del self.blocked[node]
+        return old_path
+
+    def load(self, paths: Dict[Tuple[int, int], Dict['Direction', Tuple[Tuple[int, int], 'Direction', int]]]):
+        """
+            Replaces all paths at once, the free and blocked indexes are built in one pass instead of per set_path.
+            :param paths: Dict in the format of Planet.get_paths(), taken over without a copy
+            :return: void
+            """
+        self.paths = paths
+        self.free = {}
+        self.blocked = {}
+        for node, node_paths in paths.items():
+            self.free[node] = {direction: path for direction, path in node_paths.items() if path[2] != -1}
+            blocked = {direction: path[:2] for direction, path in node_paths.items() if path[2] == -1}
+            if blocked:
+                self.blocked[node] = blocked
+
+    def view(self) -> Dict[Tuple[int, int], Dict['Direction', Tuple[Tuple[int, int], 'Direction', int]]]:
+        """
+            :return: Dict in the format of Planet.get_paths()
+            """
+        return self.paths
+
+    def traversable(self) -> Dict[Tuple[int, int], Dict['Direction', Tuple[Tuple[int, int], 'Direction', int]]]:
+        """
+            :return: Dict in the format of Planet.get_paths() without the blocked paths, every node is contained
+            """
+        return self.free
+
+    def blocked_paths(self, node: Tuple[int, int]) -> Dict['Direction', Tuple[Tuple[int, int], 'Direction']]:
+        """
+            :param node: 2-Tuple
+            :return: Dict Direction -> (2-Tuple, Direction) of the blocked paths of node
+            """
+        return dict(self.blocked.get(node, {}))
+
+
+class ArrayPathStore:
+    """
+    Stores the paths of a planet in flat arrays. Every node is interned to a dense integer id and owns the four
+    slots id * 4 + direction / 90, one per direction. An empty slot has the target id -1.
+    The order in which the directions of a node were added is packed into one 16 bit integer (3 bits count,
+    then 2 bits per direction) so that iterating a node yields them in the same order as the dict store.
+    free_order packs the traversable directions (weight != -1) the same way and blocked holds a 4 bit mask
+    of the blocked directions per node, both updated by set_path.
+    """
+    def __init__(self):
+        """ Initializes the data structure """
+        from planet import Direction
+        self.directions: Tuple['Direction', ...] = tuple(Direction)
+        self.ids: Dict[Tuple[int, int], int] = {}
+        self.nodes: List[Tuple[int, int]] = []
+        self.targets = array('i')
+        self.target_directions = array('b')
+        self.weights = array('i')
+        self.order = array('H')
+        self.free_order = array('H')
+        self.blocked = array('B')
+
+    def intern(self, node: Tuple[int, int]) -> int:
+        """
+            Returns the id of node and allocates its four slots if it is new.
+            :param node: 2-Tuple
+            :return: Integer
+            """
+        node_id = self.ids.get(node)
+        if node_id is None:
+            node_id = self.ids[node] = len(self.nodes)
+            self.nodes.append(node)
+            self.targets.extend((-1, -1, -1, -1))
+            self.target_directions.extend((0, 0, 0, 0))
+            self.weights.extend((0, 0, 0, 0))
+            self.order.append(0)
+            self.free_order.append(0)
+            self.blocked.append(0)
+        return node_id
+
+    def set_path(self, node: Tuple[int, int], direction: 'Direction', target: Tuple[int, int],
+                 target_direction: 'Direction', weight: int) -> Optional[Tuple[Tuple[int, int], 'Direction', int]]:
+        """
+            Sets the outgoing path of node in direction.
+            :param node: 2-Tuple
+            :param direction: Direction
+            :param target: 2-Tuple, end of the path
+            :param target_direction: Direction, direction of the path at its end
+            :param weight: Integer
+            :return: (2-Tuple, Direction, weight) which was replaced or None
+            """
+        node_id = self.intern(node)
+        target_id = self.intern(target)
+        index = int(direction) // 90
+        slot = node_id * 4 + index
+        if self.targets[slot] == -1:
+            old_path = None
+            count = self.order[node_id] & 7
+            self.order[node_id] += (index << (3 + 2 * count)) + 1
+        else:
+            old_path = self.path(slot)
+        self.targets[slot] = target_id
+        self.target_directions[slot] = int(target_direction) // 90
+        self.weights[slot] = weight
+        if weight == -1:
+            self.blocked[node_id] |= 1 << index
+        else:
+            self.blocked[node_id] &= ~(1 << index) & 15
+        code = 0
+        for used_slot in self.slots(node_id):
+            if self.weights[used_slot] != -1:
+                code += ((used_slot & 3) << (3 + 2 * (code & 7))) + 1
+        self.free_order[node_id] = code
+        return old_path
+
+    def path(self, slot: int) -> Tuple[Tuple[int, int], 'Direction', int]:
+        """
+            :param slot: Integer, node id * 4 + direction / 90 of a used slot
+            :return: (2-Tuple, Direction, weight)
+            """
+        return self.nodes[self.targets[slot]], self.directions[self.target_directions[slot]], self.weights[slot]
+
+    def slots(self, node_id: int, free: bool = False) -> Iterator[int]:
+        """
+            Yields the used slots of a node in the order in which they were added.
+            :param node_id: Integer
+            :param free: bool, only the slots of traversable paths
+            """
+        code = self.free_order[node_id] if free else self.order[node_id]
+        base = node_id * 4
+        for position in range(code & 7):
+            yield base + ((code >> (3 + 2 * position)) & 3)
+
+    def view(self) -> 'ArrayPathsView':
+        """
+            :return: read only Mapping in the format of Planet.get_paths()
+            """
+        return ArrayPathsView(self)
+
+    def traversable(self) -> 'ArrayPathsView':
+        """
+            :return: read only Mapping in the format of Planet.get_paths() without the blocked paths
+            """
+        return ArrayPathsView(self, True)
+
+    def blocked_paths(self, node: Tuple[int, int]) -> Dict['Direction', Tuple[Tuple[int, int], 'Direction']]:
+        """
+            :param node: 2-Tuple
+            :return: Dict Direction -> (2-Tuple, Direction) of the blocked paths of node
+            """
+        node_id = self.ids.get(node)
+        if node_id is None:
+            return {}
+        mask = self.blocked[node_id]
+        return {self.directions[slot & 3]: self.path(slot)[:2] for slot in self.slots(node_id) if mask >> (slot & 3) & 1}
+
+
+class ArrayPathsView(Mapping):
+    """
+    Read only Mapping node -> {Direction: (node, Direction, weight)} over an ArrayPathStore
+    """
+    def __init__(self, store: ArrayPathStore, free: bool = False):
+        """
+            :param store: ArrayPathStore
+            :param free: bool, leave out the blocked paths
+            """
+        self.store = store
+        self.free = free
+
+    def __getitem__(self, node: Tuple[int, int]) -> 'NodePathsView':
+        return NodePathsView(self.store, self.store.ids[node], self.free)
+
+    def __contains__(self, node) -> bool:
+        return node in self.store.ids
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        return iter(self.store.nodes)
+
+    def __len__(self) -> int:
+        return len(self.store.nodes)
+
+
+class NodePathsView(Mapping):
+    """
+    Read only Mapping Direction -> (node, Direction, weight) of the outgoing paths of one node
+    """
+    def __init__(self, store: ArrayPathStore, node_id: int, free: bool = False):
+        self.store = store
+        self.node_id = node_id
+        self.free = free
+
+    def __getitem__(self, direction: 'Direction') -> Tuple[Tuple[int, int], 'Direction', int]:
+        try:
+            slot = self.node_id * 4 + int(direction) // 90
+        except (TypeError, ValueError):
+            raise KeyError(direction)
+        if direction not in self.store.directions or self.store.targets[slot] == -1:
+            raise KeyError(direction)
+        if self.free and self.store.weights[slot] == -1:
+            raise KeyError(direction)
+        return self.store.path(slot)
+
+    def __iter__(self) -> Iterator['Direction']:
+        for slot in self.store.slots(self.node_id, self.free):
+            yield self.store.directions[slot & 3]
+
+    def __len__(self) -> int:
+        return (self.store.free_order if self.free else self.store.order)[self.node_id] & 7
+
+    def items(self):
+        store = self.store
+        return [(store.directions[slot & 3], store.path(slot)) for slot in store.slots(self.node_id, self.free)]
@@ -0,0 +1,629 @@
+#!/usr/bin/env python3
+
+# Attention: Do not import the ev3dev.ev3 module in this file
+from bisect import bisect_left, insort
+from heapq import heappush, heappop
+from typing import List, Tuple, Dict, Set, Union, Callable, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from planet import Direction
+
+
+Node = Tuple[int, int]
+Paths = Dict[Node, Dict['Direction', Tuple[Node, 'Direction', int]]]
+Path = List[Tuple[Node, 'Direction']]
+Incoming = Dict[Node, Set[Tuple[Node, 'Direction']]]
+
+
+class SearchStats:
+    """
+    Counts the work done by the searches of a Planet.
+    """
+    def __init__(self):
+        self.searches = 0
+        self.expanded = 0
+
+    def add(self, expanded: int, new_search: bool = True):
+        """
+            Records one search.
+            :param expanded: Integer, number of nodes whose outgoing paths were relaxed
+            :param new_search: bool, False if the nodes continue an earlier search (see ShortestPathTree.settle)
+            :return: void
+            """
+        self.searches += new_search
+        self.expanded += expanded
+
+
+def dijkstra(paths: Paths, start: Node, target: Node, stats: Optional[SearchStats] = None) -> Union[None, Path]:
+    """
+        Heap based Dijkstra between two nodes. Returns exactly the same path as the linear scan
+        in Planet, because nodes with the same distance are settled in the order in which they were
+        first reached (every node keeps its first insertion rank as second heap key).
+        Stale heap entries are skipped when popped (lazy deletion instead of decrease-key).
+        :param paths: Dict in the format of Planet.get_traversable_paths()
+        :param start: 2-Tuple
+        :param target: 2-Tuple
+        :param stats: SearchStats which counts the expanded nodes
+        :return: List[2-Tuple, Direction] or None if the target is not reachable
+        """
+    if start == target:
+        return []
+    if start not in paths or target not in paths:
+        return None
+
+    table, _ = _search(paths, start, lambda node: node == target, None, stats)
+    if target not in table:
+        return None
+    return build_path(table, start, target)
+
+
+def astar(paths: Paths, start: Node, target: Node, heuristic: Callable[[Node], float],
+          stats: Optional[SearchStats] = None) -> Union[None, Path]:
+    """
+        A* between two nodes. The heuristic has to be consistent (never decrease by more than the
+        weight of a path), then the returned path is as short as the one of dijkstra().
+        :param paths: Dict in the format of Planet.get_traversable_paths()
+        :param start: 2-Tuple
+        :param target: 2-Tuple
+        :param heuristic: function which estimates the remaining distance from a node to target
+        :param stats: SearchStats which counts the expanded nodes
+        :return: List[2-Tuple, Direction] or None if the target is not reachable
+        """
+    if start == target:
+        return []
+    if start not in paths or target not in paths:
+        return None
+
+    table, _ = _search(paths, start, lambda node: node == target, heuristic, stats)
+    if target not in table:
+        return None
+    return build_path(table, start, target)
+
+
+def bidirectional_dijkstra(paths: Paths, incoming: Incoming, start: Node, target: Node,
+                           stats: Optional[SearchStats] = None) -> Union[None, Path]:
+    """
+        Runs Dijkstra forwards from start and backwards from target at the same time and stops as soon
+        as the two smallest open distances add up to the shortest connection found so far.
+        :param paths: Dict in the format of Planet.get_traversable_paths()
+        :param incoming: Dict node -> set of (node, Direction) slots whose traversable path ends at that node
+        :param start: 2-Tuple
+        :param target: 2-Tuple
+        :param stats: SearchStats which counts the expanded nodes
+        :return: List[2-Tuple, Direction] or None if the target is not reachable
+        """
+    if start == target:
+        return []
+    if start not in paths or target not in paths:
+        return None
+
+    # forward entries: node -> (distance, previous node, direction at previous node)
+    # backward entries: node -> (distance to target, next node, direction at node)
+    forward = {start: (0, None, None)}
+    backward = {target: (0, None, None)}
+    forward_heap = [(0, start)]
+    backward_heap = [(0, target)]
+    forward_settled = set()
+    backward_settled = set()
+    best = None
+    best_dist = None
+    while forward_heap and backward_heap:
+        if best_dist is not None and forward_heap[0][0] + backward_heap[0][0] >= best_dist:
+            break
+        if forward_heap[0][0] <= backward_heap[0][0]:
+            dist, node = heappop(forward_heap)
+            if node in forward_settled:
+                continue
+            forward_settled.add(node)
+            for direction, (next_node, _, weight) in paths[node].items():
+                entry = forward.get(next_node)
+                if entry is None or dist + weight < entry[0]:
+                    forward[next_node] = (dist + weight, node, direction)
+                    heappush(forward_heap, (dist + weight, next_node))
+                other = backward.get(next_node)
+                if other is not None and (best_dist is None or dist + weight + other[0] < best_dist):
+                    best_dist = dist + weight + other[0]
+                    best = (node, direction, next_node)
+        else:
+            dist, node = heappop(backward_heap)
+            if node in backward_settled:
+                continue
+            backward_settled.add(node)
+            for prev_node, direction in incoming.get(node, ()):
+                weight = paths[prev_node][direction][2]
+                entry = backward.get(prev_node)
+                if entry is None or dist + weight < entry[0]:
+                    backward[prev_node] = (dist + weight, node, direction)
+                    heappush(backward_heap, (dist + weight, prev_node))
+                other = forward.get(prev_node)
+                if other is not None and (best_dist is None or dist + weight + other[0] < best_dist):
+                    best_dist = dist + weight + other[0]
+                    best = (prev_node, direction, node)
+    if stats is not None:
+        stats.add(len(forward_settled) + len(backward_settled))
+
+    if best is None:
+        return None
+    last_forward, direction, node = best
+    path = build_path(forward, start, last_forward)
+    path.append((last_forward, direction))
+    while node != target:
+        _, next_node, next_direction = backward[node]
+        path.append((node, next_direction))
+        node = next_node
+    return path
+
+
+def heading_dijkstra(paths: Paths, start: Node, target: Node, heading: Optional['Direction'],
+                     turn_costs: Dict[int, float], stats: Optional[SearchStats] = None) -> Union[None, Path]:
+    """
+        Dijkstra over (node, heading) states which adds the cost of turning at every node to the path weights.
+        Leaving a node in direction d while facing heading h costs turn_costs[(d - h) % 360]. After a path the
+        robot faces away from the direction the path ends in.
+        :param paths: Dict in the format of Planet.get_traversable_paths()
+        :param start: 2-Tuple
+        :param target: 2-Tuple
+        :param heading: Direction the robot faces at start or None if the first turn is free
+        :param turn_costs: Dict turn angle (0, 90, 180, 270, clockwise) -> cost
+        :param stats: SearchStats which counts the expanded states
+        :return: List[2-Tuple, Direction] or None if the target is not reachable
+        """
+    if start == target:
+        return []
+    if start not in paths or target not in paths:
+        return None
+
+    # state (node, heading) -> (cost, previous state, direction taken at the previous node)
+    start_state = (start, None if heading is None else int(heading))
+    table = {start_state: (0, None, None)}
+    settled = set()
+    heap = [(0, 0, start_state)]
+    counter = 1
+    found = None
+    while heap:
+        cost, _, state = heappop(heap)
+        if state in settled:
+            continue
+        node, facing = state
+        if node == target:
+            found = state
+            break
+        settled.add(state)
+        for direction, (next_node, next_direction, weight) in paths[node].items():
+            turn = 0 if facing is None else turn_costs[(int(direction) - facing) % 360]
+            next_state = (next_node, (int(next_direction) + 180) % 360)
+            new_cost = cost + turn + weight
+            entry = table.get(next_state)
+            if entry is None or new_cost < entry[0]:
+                table[next_state] = (new_cost, state, direction)
+                heappush(heap, (new_cost, counter, next_state))
+                counter += 1
+    if stats is not None:
+        stats.add(len(settled))
+
+    if found is None:
+        return None
+    path: Path = []
+    state = found
+    while state != start_state:
+        _, state, direction = table[state]
+        path.append((state[0], direction))
+    path.reverse()
+    return path
+
+
+def dijkstra_unexplored(paths: Paths, start: Node, is_unexplored: Callable[[Node], bool],
+                        stats: Optional[SearchStats] = None) -> Union[None, Path]:
+    """
+        Heap based Dijkstra to the closest node for which is_unexplored returns True.
+        :param paths: Dict in the format of Planet.get_traversable_paths()
+        :param start: 2-Tuple
+        :param is_unexplored: function which takes a node and decides if the search stops there
+        :param stats: SearchStats which counts the expanded nodes
+        :return: List[2-Tuple, Direction] or None if no such node is reachable
+        """
+    table, found = _search(paths, start, is_unexplored, None, stats)
+    if found is None:
+        return None
+    return build_path(table, start, found)
+
+
+def build_path(table: Dict[Node, Tuple[int, Optional[Node], Optional['Direction']]], start: Node, target: Node) -> Path:
+    """
+        Follows the predecessors of a search table back from target to start.
+        :param table: Dict node -> (distance, previous node, direction taken at previous node)
+        :param start: 2-Tuple
+        :param target: 2-Tuple
+        :return: List[2-Tuple, Direction]
+        """
+    path: Path = []
+    node = target
+    while node != start:
+        _, node, direction = table[node]
+        path.append((node, direction))
+    path.reverse()
+    return path
+
+
+def _search(paths: Paths, start: Node, stop: Callable[[Node], bool],
+            heuristic: Optional[Callable[[Node], float]], stats: Optional[SearchStats]):
+    """
+        Settles nodes from start in order of (distance + heuristic, first insertion) until stop returns True.
+        :return: (table, node the search stopped at or None)
+        """
+    table = {start: (0, None, None)}
+    rank = {start: 0}
+    settled = set()
+    heap = [(0, 0, start)]
+    found = None
+    while heap:
+        _, _, current_node = heappop(heap)
+        if current_node in settled:
+            continue
+        if stop(current_node):
+            found = current_node
+            break
+        settled.add(current_node)
+        dist = table[current_node][0]
+        for direction, (node, _, weight) in paths[current_node].items():
+            new_dist = dist + weight
+            entry = table.get(node)
+            if entry is None:
+                rank[node] = len(rank)
+            elif new_dist >= entry[0]:
+                continue
+            table[node] = (new_dist, current_node, direction)
+            heappush(heap, (new_dist if heuristic is None else new_dist + heuristic(node), rank[node], node))
+    if stats is not None:
+        stats.add(len(settled))
+    return table, found
+
+
+class ShortestPathTree:
+    """
+    Single source shortest path tree, settled in the same order as dijkstra() and therefore
+    answering every query from its start exactly like a fresh search would. The search is lazy:
+    it only settles nodes until the query can be answered and continues from there for the next one,
+    so the first query costs no more than a search which stops at its target.
+    """
+    def __init__(self, paths: Paths, start: Node, stats: Optional[SearchStats] = None):
+        """
+            Prepares Dijkstra from start, nodes are settled by the queries (or settle()).
+            :param paths: Dict in the format of Planet.get_traversable_paths(), read again by every continuation
+            :param start: 2-Tuple
+            :param stats: SearchStats which counts the expanded nodes
+            """
+        self.start = start
+        self.stats = stats
+        self.paths = paths
+        self.table: Dict[Node, Tuple[int, Optional[Node], Optional['Direction']]] = {start: (0, None, None)}
+        # settle index of every settled node and settle index of the node which reached a node first
+        self.index: Dict[Node, int] = {}
+        self.first: Dict[Node, int] = {start: -1}
+        self.insertion = {start: 0}
+        self.heap = [(0, 0, start)]
+        self.counted = False
+
+    def settle(self, stop: Optional[Callable[[Node], bool]] = None) -> Optional[Node]:
+        """
+            Continues the search until stop returns True for a newly settled node or every reachable node is settled.
+            :param stop: function which takes a node or None to settle all
+            :return: 2-Tuple, the node stop returned True for, or None
+            """
+        heap, table, index, first, insertion, paths = \
+            self.heap, self.table, self.index, self.first, self.insertion, self.paths
+        settled = len(index)
+        found = None
+        while heap:
+            dist, _, current_node = heappop(heap)
+            if current_node in index:
+                continue
+            current_index = len(index)
+            index[current_node] = current_index
+            for direction, (node, _, weight) in paths[current_node].items():
+                new_dist = dist + weight
+                entry = table.get(node)
+                if entry is None:
+                    insertion[node] = len(insertion)
+                    first[node] = current_index
+                elif new_dist >= entry[0]:
+                    continue
+                table[node] = (new_dist, current_node, direction)
+                heappush(heap, (new_dist, insertion[node], node))
+            if stop is not None and stop(current_node):
+                found = current_node
+                break
+        if self.stats is not None and len(index) > settled:
+            self.stats.add(len(index) - settled, not self.counted)
+            self.counted = True
+        return found
+
+    def distance(self, target: Node) -> Optional[int]:
+        """
+            :param target: 2-Tuple
+            :return: length of the shortest path to target or None if it is not reachable
+            """
+        if target not in self.index:
+            self.settle(lambda node: node == target)
+        if target not in self.index:
+            return None
+        return self.table[target][0]
+
+    def path_to(self, target: Node) -> Union[None, Path]:
+        """
+            :param target: 2-Tuple
+            :return: List[2-Tuple, Direction] or None if target is not reachable
+            """
+        if self.distance(target) is None:
+            return None
+        return build_path(self.table, self.start, target)
+
+    def closest(self, predicate: Callable[[Node], bool]) -> Union[None, Path]:
+        """
+            Returns the path to the first settled node for which predicate returns True.
+            :param predicate: function which takes a node
+            :return: List[2-Tuple, Direction] or None if no reachable node matches
+            """
+        for node in self.index:
+            if predicate(node):
+                return build_path(self.table, self.start, node)
+        node = self.settle(predicate)
+        return None if node is None else build_path(self.table, self.start, node)
+
+    def apply_change(self, paths: Paths, incoming: Incoming, node: Node, direction: 'Direction',
+                     old: Optional[Tuple[Node, 'Direction', int]], new: Optional[Tuple[Node, 'Direction', int]]) -> bool:
+        """
+            Called after the outgoing path of node in direction has been replaced in paths.
+            :param paths: Dict in the format of Planet.get_traversable_paths(), already containing the change
+            :param incoming: Dict node -> set of (node, Direction) slots whose traversable path ends at that node
+            :param node: 2-Tuple, start of the changed path
+            :param direction: Direction, start direction of the changed path
+            :param old: (node, Direction, weight) before the change or None
+            :param new: (node, Direction, weight) after the change
+            :return: bool, False if the tree is no longer valid and has to be dropped
+            """
+        return not self.affected_by(node, direction, old, new)
+
+    def apply_changes(self, paths: Paths, incoming: Incoming,
+                      changes: List[Tuple[Node, 'Direction', Optional[Tuple[Node, 'Direction', int]], Tuple[Node, 'Direction', int]]]) -> bool:
+        """
+            Called after several outgoing paths have been replaced in paths at once (see Planet.batch).
+            Every change is checked against the tree as it was before all of them.
+            :param paths: Dict in the format of Planet.get_traversable_paths(), already containing the changes
+            :param incoming: Dict node -> set of (node, Direction) slots whose traversable path ends at that node
+            :param changes: List of (node, Direction, old path or None, new path), as for apply_change
+            :return: bool, False if the tree is no longer valid and has to be dropped
+            """
+        return not any(self.affected_by(node, direction, old, new) for node, direction, old, new in changes)
+
+    def affected_by(self, node: Node, direction: 'Direction', old: Optional[Tuple[Node, 'Direction', int]],
+                    new: Optional[Tuple[Node, 'Direction', int]]) -> bool:
+        """
+            Checks if replacing the outgoing path of node in direction by another one can change this tree.
+            A path is only relaxed once, when node is settled, so it can not matter if node is not settled yet,
+            if it ends at a node settled before node or if it never improves or first reaches its end node.
+            :param node: 2-Tuple, start of the changed path
+            :param direction: Direction, start direction of the changed path
+            :param old: (node, Direction, weight) before the change or None
+            :param new: (node, Direction, weight) after the change or None
+            :return: bool, True if the tree has to be rebuilt
+            """
+        node_index = self.index.get(node)
+        if node_index is None:
+            return False
+        if old is not None and old[2] != -1:
+            end = old[0]
+            end_index = self.index.get(end)
+            # an end which is not settled yet comes after node
+            if end_index is None or end_index > node_index:
+                if self.table[end][1:] == (node, direction) or self.first[end] == node_index:
+                    return True
+        if new is not None and new[2] != -1:
+            end = new[0]
+            if end not in self.table:
+                return True
+            end_index = self.index.get(end)
+            if end_index is None or end_index > node_index:
+                if self.first[end] >= node_index or self.table[node][0] + new[2] <= self.table[end][0]:
+                    return True
+        return False
+
+
+class DynamicShortestPathTree(ShortestPathTree):
+    """
+    Shortest path tree which is repaired instead of rebuilt when a path changes (in the style of
+    Ramalingam and Reps): a new or cheaper path only propagates to the nodes it improves and a removed,
+    blocked or more expensive tree path only recomputes the subtree hanging below it.
+    Distances are always exact, but among paths of equal length it may keep another one than a
+    fresh search would choose.
+    """
+    def __init__(self, paths: Paths, start: Node, stats: Optional[SearchStats] = None):
+        """
+            Runs Dijkstra from start and sets up the structures for the repairs.
+            :param paths: Dict in the format of Planet.get_traversable_paths()
+            :param start: 2-Tuple
+            :param stats: SearchStats which counts the expanded nodes
+            """
+        super().__init__(paths, start, stats)
+        self.settle()
+        # nodes sorted by (distance, rank), which equals the settle order of the first search
+        self.rank: Dict[Node, int] = dict(self.index)
+        self.order: List[Tuple[int, int, Node]] = [(self.table[node][0], rank, node) for node, rank in self.index.items()]
+        self.children: Dict[Node, Set[Node]] = {node: set() for node in self.table}
+        for node, (_, prev, _) in self.table.items():
+            if prev is not None:
+                self.children[prev].add(node)
+        # the settle indices and the search are not maintained by the repairs
+        self.index = {}
+        self.first = {}
+        self.heap = []
+
+    def distance(self, target: Node) -> Optional[int]:
+        entry = self.table.get(target)
+        return None if entry is None else entry[0]
+
+    def path_to(self, target: Node) -> Union[None, Path]:
+        if target not in self.table:
+            return None
+        return build_path(self.table, self.start, target)
+
+    def closest(self, predicate: Callable[[Node], bool]) -> Union[None, Path]:
+        """
+            Returns the path to the closest node for which predicate returns True.
+            :param predicate: function which takes a node
+            :return: List[2-Tuple, Direction] or None if no reachable node matches
+            """
+        for _, _, node in self.order:
+            if predicate(node):
+                return build_path(self.table, self.start, node)
+        return None
+
+    def apply_change(self, paths: Paths, incoming: Incoming, node: Node, direction: 'Direction',
+                     old: Optional[Tuple[Node, 'Direction', int]], new: Optional[Tuple[Node, 'Direction', int]]) -> bool:
+        """
+            Repairs the tree after the outgoing path of node in direction has been replaced in paths.
+            :param paths: Dict in the format of Planet.get_traversable_paths(), already containing the change
+            :param incoming: Dict node -> set of (node, Direction) slots whose traversable path ends at that node
+            :param node: 2-Tuple, start of the changed path
+            :param direction: Direction, start direction of the changed path
+            :param old: (node, Direction, weight) before the change or None
+            :param new: (node, Direction, weight) after the change
+            :return: bool, always True
+            """
+        if node not in self.table:
+            return True
+        old_usable = old is not None and old[2] != -1
+        new_usable = new is not None and new[2] != -1
+        decrease = old_usable and new_usable and old[:2] == new[:2] and new[2] <= old[2]
+        if old_usable and not decrease:
+            entry = self.table.get(old[0])
+            if entry is not None and entry[1:] == (node, direction):
+                self._detach(old[0], paths, incoming)
+        if new_usable and node in self.table:
+            new_dist = self.table[node][0] + new[2]
+            entry = self.table.get(new[0])
+            if entry is None or new_dist < entry[0]:
+                self._propagate([(new_dist, self._rank(new[0]), new[0], node, direction)], paths)
+        return True
+
+    def apply_changes(self, paths: Paths, incoming: Incoming,
+                      changes: List[Tuple[Node, 'Direction', Optional[Tuple[Node, 'Direction', int]], Tuple[Node, 'Direction', int]]]) -> bool:
+        """
+            Repairs the tree after several paths changed at once (see Planet.batch). First the subtrees below all
+            removed, blocked or more expensive tree paths are cut off, then their nodes are reconnected and the new
+            and cheaper paths are propagated together. Every distance left in the tree is an upper bound in paths,
+            so one propagation over paths with all changes makes them exact again.
+            :param paths: Dict in the format of Planet.get_traversable_paths(), already containing the changes
+            :param incoming: Dict node -> set of (node, Direction) slots whose traversable path ends at that node
+            :param changes: List of (node, Direction, old path or None, new path), as for apply_change
+            :return: bool, always True
+            """
+        roots = []
+        improved = []
+        for node, direction, old, new in changes:
+            if node not in self.table:
+                # relaxed with its current paths if the propagation reaches node
+                continue
+            old_usable = old is not None and old[2] != -1
+            new_usable = new is not None and new[2] != -1
+            decrease = old_usable and new_usable and old[:2] == new[:2] and new[2] <= old[2]
+            if old_usable and not decrease:
+                entry = self.table.get(old[0])
+                if entry is not None and entry[1:] == (node, direction):
+                    roots.append(old[0])
+            if new_usable:
+                improved.append((node, direction, new))
+        affected = []
+        for root in roots:
+            # a root inside a subtree cut off before is gone already
+            if root in self.table:
+                affected.extend(self._cut(root))
+        heap = self._reconnect(affected, paths, incoming)
+        for node, direction, new in improved:
+            entry = self.table.get(node)
+            if entry is None:
+                continue
+            end_entry = self.table.get(new[0])
+            if end_entry is None or entry[0] + new[2] < end_entry[0]:
+                heappush(heap, (entry[0] + new[2], self._rank(new[0]), new[0], node, direction))
+        self._propagate(heap, paths)
+        return True
+
+    def _detach(self, root: Node, paths: Paths, incoming: Incoming):
+        """
+            Removes the subtree below root and reconnects its nodes over their cheapest remaining paths.
+            """
+        self._propagate(self._reconnect(self._cut(root), paths, incoming), paths)
+
+    def _cut(self, root: Node) -> List[Node]:
+        """
+            Removes root and the subtree below it from the tree.
+            :return: List of the removed nodes
+            """
+        affected = []
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            affected.append(node)
+            stack.extend(self.children[node])
+        for node in affected:
+            self._unset(node)
+        return affected
+
+    def _reconnect(self, affected: List[Node], paths: Paths, incoming: Incoming) -> list:
+        """
+            :return: heap for _propagate with the cheapest remaining path into every removed node from the tree
+            """
+        heap = []
+        for node in affected:
+            best = None
+            for prev, direction in incoming.get(node, ()):
+                entry = self.table.get(prev)
+                if entry is None:
+                    continue
+                weight = paths[prev][direction][2]
+                if best is None or entry[0] + weight < best[0]:
+                    best = (entry[0] + weight, self.rank[node], node, prev, direction)
+            if best is not None:
+                heappush(heap, best)
+        return heap
+
+    def _propagate(self, heap: list, paths: Paths):
+        """
+            Dijkstra which only continues from nodes whose distance it could improve.
+            :param heap: list of (distance, rank, node, previous node, direction) candidates
+            """
+        expanded = 0
+        while heap:
+            dist, _, node, prev, direction = heappop(heap)
+            entry = self.table.get(node)
+            if entry is not None and entry[0] <= dist:
+                continue
+            self._set(node, dist, prev, direction)
+            expanded += 1
+            # add_path reports the first half of a new path before its end node has paths of its own
+            for next_direction, (next_node, _, weight) in paths.get(node, {}).items():
+                entry = self.table.get(next_node)
+                if entry is None or dist + weight < entry[0]:
+                    heappush(heap, (dist + weight, self._rank(next_node), next_node, node, next_direction))
+        if self.stats is not None:
+            self.stats.add(expanded)
+
+    def _rank(self, node: Node) -> int:
+        rank = self.rank.get(node)
+        if rank is None:
+            rank = self.rank[node] = len(self.rank)
+        return rank
+
+    def _set(self, node: Node, dist: int, prev: Node, direction: 'Direction'):
+        if node in self.table:
+            self._unset(node)
+        self.table[node] = (dist, prev, direction)
+        self.children.setdefault(node, set())
+        self.children[prev].add(node)
+        insort(self.order, (dist, self.rank[node], node))
+
+    def _unset(self, node: Node):
+        dist, prev, _ = self.table.pop(node)
+        del self.order[bisect_left(self.order, (dist, self.rank[node], node))]
+        self.children[prev].discard(node)
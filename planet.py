@@ -1,10 +1,21 @@
 #!/usr/bin/env python3
 
 # Attention: Do not import the ev3dev.ev3 module in this file
+import logging
 import math
+from contextlib import contextmanager
 from enum import IntEnum, unique
-from typing import List, Tuple, Dict, Union, Optional
+from typing import List, Tuple, Dict, Set, Union, Optional
 
+import pathfinding
+from contraction import ContractionHierarchy
+from distance_matrix import DistanceMatrix
+from path_store import DictPathStore, ArrayPathStore
+from frontier import Frontier
+from node_state import NodeStates, KNOWN, UNDISCOVERED, BLOCKED, VISITED, SCANNED, direction_mask
+import robot_log
+
+logger = robot_log.get_logger('planet')
 
 # @CREDITS: Lea Häusler
 # @SOURCE: https://se-gitlab.inf.tu-dresden.de/C0ntroller/tutorbot/-/raw/master/src/planet.py
@@ -18,18 +29,72 @@ class Direction(IntEnum):
     WEST = 270
 
 
+@unique
+class ExplorationState(IntEnum):
+    UNKNOWN = 0  # the node has not been scanned yet
+    UNEXPLORED = 1  # the node has been scanned and still has undiscovered directions
+    EXPLORED = 2
+
+
 class Planet:
     """
     Contains the representation of the map and provides certain functions to manipulate or extend
     it according to the specifications
     """
-    def __init__(self):
-        """ Initializes the data structure """
+    PATH_ENGINES = ('linear', 'heap', 'astar', 'bidirectional', 'heading', 'ch')
+    # cost of a clockwise turn by 0, 90, 180 or 270 degrees in path weight units, used by the 'heading' engine
+    DEFAULT_TURN_COSTS = {0: 0, 90: 1, 180: 2, 270: 1}
+    STORAGES = ('dict', 'array')
+
+    def __init__(self, path_engine: str = 'heap', cache_paths: bool = True, path_cache_size: int = 32,
+                 dynamic_paths: bool = False, storage: str = 'dict', turn_costs: Optional[Dict[int, float]] = None):
+        """
+        Initializes the data structure
+        :param path_engine: 'heap' (priority queue), 'linear' (original scan over the whole table), 'astar' (heap
+            search guided by the grid coordinates), 'bidirectional' (heap searches from both ends) or 'heading' (heap
+            search which also charges the turns at the nodes) or 'ch' (contraction hierarchy, see contraction.py,
+            built on the first search and again after the paths changed)
+        :param cache_paths: bool, answer searches of the heap engine from cached shortest path trees
+        :param path_cache_size: Integer, maximum number of cached trees (one per start node)
+        :param dynamic_paths: bool, repair cached trees on add_path instead of dropping them
+        :param storage: 'dict' (dict of dicts) or 'array' (interned node ids and flat arrays, see path_store.py)
+        :param turn_costs: Dict turn angle -> cost for the 'heading' engine, defaults to DEFAULT_TURN_COSTS
+        """
+        if path_engine not in self.PATH_ENGINES:
+            raise ValueError(f'Unknown path engine {path_engine!r}, expected one of {self.PATH_ENGINES}')
+        if storage not in self.STORAGES:
+            raise ValueError(f'Unknown storage {storage!r}, expected one of {self.STORAGES}')
+        self.path_engine = path_engine
+        self.turn_costs = dict(self.DEFAULT_TURN_COSTS if turn_costs is None else turn_costs)
         self.target = None
-        self.path_dict: Dict[Tuple[int, int], Dict[Direction, Tuple[Tuple[int, int], Direction, int]]] = {}
-        self.undiscovered_directions = {}
-        self.unexplored_nodes = []
+        self.paths = DictPathStore() if storage == 'dict' else ArrayPathStore()
+        self.node_states = NodeStates()
+        self.unexplored_nodes = Frontier()
         self.visited_nodes: Dict[Tuple[int, int], bool] = {}
+        # kept up to date by add_path and every change of the undiscovered directions
+        self.explored_count = 0
+        self.unexplored_count = 0
+        self.open_path_nodes = 0  # nodes with paths which are not explored (unknown or unexplored)
+        self.cache_paths = cache_paths
+        self.path_cache_size = path_cache_size
+        self.dynamic_paths = dynamic_paths
+        # node -> (node, Direction) slots whose traversable path ends at that node
+        self.incoming_paths: Dict[Tuple[int, int], Set[Tuple[Tuple[int, int], Direction]]] = {}
+        self.path_trees: Dict[Tuple[int, int], pathfinding.ShortestPathTree] = {}
+        self.path_cache_hits = 0
+        self.path_cache_misses = 0
+        self.search_stats = pathfinding.SearchStats()
+        self.hierarchy: Optional[ContractionHierarchy] = None
+        self.hierarchy_builds = 0
+        self.matrix: Optional[DistanceMatrix] = None
+        # smallest weight per grid unit of all free paths, a lower bound for the weight of any route
+        self.min_weight_per_distance: Optional[float] = None
+        # PlanetJournal (see snapshot.py) which records every change or None
+        self.journal = None
+        # open batch() contexts and the path changes they collected: (node, Direction) -> [old path, new path]
+        self.batch_depth = 0
+        self.pending_changes: Dict[Tuple[Tuple[int, int], Direction], list] = {}
+        self.cache_invalidations = 0
 
     def add_path(self, start: Tuple[Tuple[int, int], Direction], target: Tuple[Tuple[int, int], Direction],
                  weight: int):
@@ -43,12 +108,166 @@ class Planet:
         :param weight: Integer
         :return: void
         """
+        if self.journal is not None:
+            self.journal.add_path(start, target, weight)
+        distance = abs(start[0][0] - target[0][0]) + abs(start[0][1] - target[0][1])
+        if weight != -1 and distance > 0:
+            if self.min_weight_per_distance is None or weight / distance < self.min_weight_per_distance:
+                self.min_weight_per_distance = weight / distance
+
+        paths = self.get_paths()
+        for node in {start[0], target[0]}:
+            if node not in paths and self.exploration_state(node) != ExplorationState.EXPLORED:
+                self.open_path_nodes += 1
+
         for point1, point2 in [(start, target), (target, start)]:
-            if point1[0] not in self.path_dict.keys():
-                value = {point1[1]: (point2[0], point2[1], weight)}
-                self.path_dict[point1[0]] = value
+            old_path = self.paths.set_path(point1[0], point1[1], point2[0], point2[1], weight)
+            if old_path != (point2[0], point2[1], weight):
+                bit = direction_mask([point1[1]])
+                self.node_states.set_bits(point1[0], KNOWN, bit)
+                if weight == -1:
+                    self.node_states.set_bits(point1[0], BLOCKED, bit)
+                else:
+                    self.node_states.clear_bits(point1[0], BLOCKED, bit)
+                if old_path is not None:
+                    self.incoming_paths[old_path[0]].discard(point1)
+                incoming = self.incoming_paths.setdefault(point2[0], set())
+                if weight != -1:
+                    incoming.add(point1)
+                self.path_changed(point1[0], point1[1], old_path, (point2[0], point2[1], weight))
+
+    def path_changed(self, node: Tuple[int, int], direction: Direction,
+                     old_path: Optional[Tuple[Tuple[int, int], Direction, int]],
+                     new_path: Tuple[Tuple[int, int], Direction, int]):
+        """
+        Invalidates the derived caches after the outgoing path of node in direction changed, or only records the
+        change while a batch is open.
+        :param node: 2-Tuple, start of the changed path
+        :param direction: Direction, start direction of the changed path
+        :param old_path: (2-Tuple, Direction, weight) before the change or None if it is new
+        :param new_path: (2-Tuple, Direction, weight) after the change
+        :return: void
+        """
+        if self.batch_depth:
+            change = self.pending_changes.get((node, direction))
+            if change is None:
+                self.pending_changes[(node, direction)] = [old_path, new_path]
+            else:
+                change[1] = new_path
+            return
+        self.cache_invalidations += 1
+        self.hierarchy = None
+        self.matrix = None
+        self.update_path_trees(node, direction, old_path, new_path)
+
+    @contextmanager
+    def batch(self):
+        """
+        Context which applies all add_path calls inside it at once: the paths change immediately, but the caches
+        (shortest path trees, contraction hierarchy, distance matrix) are only invalidated once when the outermost
+        batch ends. A path set several times only counts with its first and its last value and a path which ends
+        up unchanged costs nothing. Searches inside the batch still see all changes made so far.
+
+        Example:
+            with planet.batch():
+                for start, target, weight in unveiled_paths:
+                    planet.add_path(start, target, weight)
+        """
+        self.batch_depth += 1
+        try:
+            yield self
+        finally:
+            self.batch_depth -= 1
+            if not self.batch_depth:
+                self.flush_changes()
+
+    def flush_changes(self):
+        """
+        Invalidates the caches for the path changes collected by the open batch, if any path really changed.
+        The shortest path trees are repaired (dynamic_paths) or dropped like after single changes.
+        :return: void
+        """
+        changes = [(node, direction, old_path, new_path)
+                   for (node, direction), (old_path, new_path) in self.pending_changes.items() if old_path != new_path]
+        self.pending_changes.clear()
+        if not changes:
+            return
+        self.cache_invalidations += 1
+        self.hierarchy = None
+        self.matrix = None
+        for start in [start for start, tree in self.path_trees.items()
+                      if not tree.apply_changes(self.get_traversable_paths(), self.incoming_paths, changes)]:
+            del self.path_trees[start]
+
+    def update_path_trees(self, node: Tuple[int, int], direction: Direction,
+                          old_path: Optional[Tuple[Tuple[int, int], Direction, int]],
+                          new_path: Optional[Tuple[Tuple[int, int], Direction, int]]):
+        """
+        Repairs (dynamic_paths) or drops the cached shortest path trees which the changed outgoing path of node could alter.
+        :param node: 2-Tuple, start of the changed path
+        :param direction: Direction, start direction of the changed path
+        :param old_path: (2-Tuple, Direction, weight) before the change or None if it is new
+        :param new_path: (2-Tuple, Direction, weight) after the change
+        :return: void
+        """
+        for start in [start for start, tree in self.path_trees.items()
+                      if not tree.apply_change(self.get_traversable_paths(), self.incoming_paths, node, direction, old_path, new_path)]:
+            del self.path_trees[start]
+
+    def shortest_path_tree(self, start: Tuple[int, int]) -> pathfinding.ShortestPathTree:
+        """
+        Returns the cached shortest path tree of start and creates it if necessary, its nodes are settled by the queries.
+        :param start: 2-Tuple, must be a node of the planet
+        :return: ShortestPathTree
+        """
+        self.flush_changes()
+        tree = self.path_trees.pop(start, None)
+        if tree is None:
+            self.path_cache_misses += 1
+            if self.dynamic_paths:
+                tree = pathfinding.DynamicShortestPathTree(self.get_traversable_paths(), start, self.search_stats)
             else:
-                self.path_dict[point1[0]][point1[1]] = (point2[0], point2[1], weight)
+                tree = pathfinding.ShortestPathTree(self.get_traversable_paths(), start, self.search_stats)
+            if self.path_trees and len(self.path_trees) >= self.path_cache_size:
+                del self.path_trees[next(iter(self.path_trees))]
+        else:
+            self.path_cache_hits += 1
+        # re-inserting keeps the dict ordered from least to most recently used
+        self.path_trees[start] = tree
+        return tree
+
+    def contraction_hierarchy(self) -> ContractionHierarchy:
+        """
+        Returns the contraction hierarchy of the current paths and builds it if add_path changed them since the last call.
+        :return: ContractionHierarchy
+        """
+        self.flush_changes()
+        if self.hierarchy is None:
+            self.hierarchy = ContractionHierarchy(self.get_traversable_paths())
+            self.hierarchy_builds += 1
+        return self.hierarchy
+
+    def distance_matrix(self) -> DistanceMatrix:
+        """
+        Returns the all pairs distance and next hop matrices of the current paths (needs numpy) and computes them
+        again if add_path changed the paths since the last call.
+        :return: DistanceMatrix
+        """
+        self.flush_changes()
+        if self.matrix is None:
+            self.matrix = DistanceMatrix(self.get_traversable_paths())
+        return self.matrix
+
+    @property
+    def path_dict(self) -> Dict[Tuple[int, int], Dict[Direction, Tuple[Tuple[int, int], Direction, int]]]:
+        """ The paths in the format of get_paths(), a read only view for the array storage """
+        return self.paths.view()
+
+    @property
+    def undiscovered_directions(self) -> Dict[Tuple[int, int], List[Direction]]:
+        """ The undiscovered directions of all scanned nodes, in scan order (built from node_states) """
+        return {node: self.node_states.undiscovered(node) for node in self.node_states
+                if self.node_states.is_scanned(node)}
 
     def get_paths(self) -> Dict[Tuple[int, int], Dict[Direction, Tuple[Tuple[int, int], Direction, int]]]:
         """
@@ -71,7 +290,28 @@ class Planet:
         """
         return self.path_dict
 
-    def shortest_path(self, start: Tuple[int, int], target: Tuple[int, int]) -> Union[None, List[Tuple[Tuple[int, int], Direction]]]:
+    def get_traversable_paths(self) -> Dict[Tuple[int, int], Dict[Direction, Tuple[Tuple[int, int], Direction, int]]]:
+        """
+        Returns all paths which are not blocked, in the format of get_paths(). Every node of get_paths() is
+        contained, a node with only blocked paths maps to an empty Dict. The searches only use these paths.
+        :return: Dict
+        """
+        return self.paths.traversable()
+
+    def get_blocked_paths(self, node: Tuple[int, int]) -> Dict[Direction, Tuple[Tuple[int, int], Direction]]:
+        """
+        Returns the blocked paths of a node. Paths are bidirectional, so every blocked path ending at node
+        is contained as well (starting at node).
+
+        Example:
+            get_blocked_paths((0, 3)) returns: {Direction.EAST: ((1, 3), Direction.WEST)}
+        :param node: 2-Tuple
+        :return: Dict Direction -> (2-Tuple, Direction)
+        """
+        return self.paths.blocked_paths(node)
+
+    def shortest_path(self, start: Tuple[int, int], target: Tuple[int, int], engine: Optional[str] = None,
+                      heading: Optional[Direction] = None) -> Union[None, List[Tuple[Tuple[int, int], Direction]]]:
         """
         Returns the shortest path between two nodes
 
@@ -80,6 +320,50 @@ class Planet:
             shortest_path((0,0), (1,2)) returns: None
         :param start: 2-Tuple
         :param target: 2-Tuple
+        :param engine: one of PATH_ENGINES to use instead of self.path_engine for this search
+        :param heading: Direction the robot faces at start, only used by the 'heading' engine
+        :return: List[2-Tuple, Direction]
+        """
+        engine = self.path_engine if engine is None else engine
+        if engine == 'linear':
+            return self._shortest_path_linear(start, target)
+        if engine == 'astar':
+            return pathfinding.astar(self.get_traversable_paths(), start, target, self.grid_heuristic(target), self.search_stats)
+        if engine == 'bidirectional':
+            return pathfinding.bidirectional_dijkstra(self.get_traversable_paths(), self.incoming_paths, start, target,
+                                                      self.search_stats)
+        if engine == 'heading':
+            return pathfinding.heading_dijkstra(self.get_traversable_paths(), start, target, heading, self.turn_costs,
+                                                self.search_stats)
+        if engine == 'ch':
+            return self.contraction_hierarchy().shortest_path(start, target, self.search_stats)
+        if engine != 'heap':
+            raise ValueError(f'Unknown path engine {engine!r}, expected one of {self.PATH_ENGINES}')
+        if not self.cache_paths:
+            return pathfinding.dijkstra(self.get_traversable_paths(), start, target, self.search_stats)
+        if start == target:
+            return []
+        if start not in self.get_paths().keys() or target not in self.get_paths().keys():
+            return None
+        return self.shortest_path_tree(start).path_to(target)
+
+    def grid_heuristic(self, target: Tuple[int, int]):
+        """
+        Returns the A* estimate for the remaining distance to target: the grid (manhattan) distance scaled by the
+        smallest weight per grid unit seen on any free path. No route can be cheaper, so the estimate is admissible.
+        :param target: 2-Tuple
+        :return: function which takes a 2-Tuple and returns a number
+        """
+        scale = self.min_weight_per_distance or 0
+        target_x, target_y = target
+        return lambda node: scale * (abs(node[0] - target_x) + abs(node[1] - target_y))
+
+    def _shortest_path_linear(self, start: Tuple[int, int], target: Tuple[int, int]) -> Union[None, List[Tuple[Tuple[int, int], Direction]]]:
+        """
+        Original implementation of shortest_path, which scans the whole table for the next node (O(V²)).
+        Kept to compare it against the heap engine.
+        :param start: 2-Tuple
+        :param target: 2-Tuple
         :return: List[2-Tuple, Direction]
         """
         if start == target:
@@ -112,6 +396,7 @@ class Planet:
                     table[node] = (current_dist + weight, current_node, direction)
 
             unvisited_nodes.remove(current_node)
+        self.search_stats.add(len(self.get_paths()) - len(unvisited_nodes))
 
         if target not in table:
             return None
@@ -139,10 +424,27 @@ class Planet:
         if start not in self.get_paths().keys():
             return None
 
-        if all(self.is_explored(node) for node in self.get_paths().keys()):
-            print('alle Knoten erforscht')
+        if self.is_fully_explored():
+            logger.info('alle Knoten erforscht')
             return None
 
+        if self.path_engine == 'linear':
+            return self._shortest_unexplored_path_linear(start)
+        if self.cache_paths:
+            path = self.shortest_path_tree(start).closest(lambda node: not self.is_explored(node))
+        else:
+            path = pathfinding.dijkstra_unexplored(self.get_traversable_paths(), start, lambda node: not self.is_explored(node),
+                                                  self.search_stats)
+        if path is None:
+            logger.info('keine Knoten erreichbar.')
+        return path
+
+    def _shortest_unexplored_path_linear(self, start: Tuple[int, int]) -> Union[None, List[Tuple[Tuple[int, int], Direction]]]:
+        """
+        Original implementation of shortest_unexplored_path, kept to compare it against the heap engine.
+        :param start: 2-Tuple
+        :return: List[2-Tuple, Direction] or None if no unexplored node is reachable
+        """
         unvisited_nodes = set(self.get_paths().keys())
         table: Dict[Tuple[int, int], Tuple[int, Tuple[int, int], Direction]] = {
             start: (0, start, Direction.NORTH)}
@@ -156,7 +458,7 @@ class Planet:
                     current_dist = table.get(node)[0]
 
             if current_node is None:
-                print('keine Knoten erreichbar. ')
+                logger.info('keine Knoten erreichbar.')
                 break
 
             if not self.is_explored(current_node):
@@ -181,39 +483,72 @@ class Planet:
         """
             Checks if a node still has unexplored directions by comparing the outgoing paths and the unexplored paths of a node.
             :param node: 2-Tuple
-            :return: boolean, if True then the node is full explored.
+            :return: boolean, if True then the node is full explored (None if the node has not been scanned yet).
             """
-        try:
-            if not self.undiscovered_directions[node]:
-                return True
-            else:
-                return False
-        except KeyError:
-            pass
+        if not self.node_states.is_scanned(node):
+            return None
+        return not self.node_states.mask(node, UNDISCOVERED)
+
+    def exploration_state(self, node: Tuple[int, int]) -> ExplorationState:
+        """
+            Tri-state version of is_explored.
+            :param node: 2-Tuple
+            :return: ExplorationState, UNKNOWN for nodes which have not been scanned
+            """
+        word = self.node_states.word(node)
+        if not word & SCANNED:
+            return ExplorationState.UNKNOWN
+        if word >> UNDISCOVERED & 15:
+            return ExplorationState.UNEXPLORED
+        return ExplorationState.EXPLORED
+
+    def is_fully_explored(self) -> bool:
+        """
+            Checks in O(1) if every node with paths has been scanned and has no undiscovered directions left.
+            :return: bool
+            """
+        return self.open_path_nodes == 0
+
+    def _update_exploration_counts(self, node: Tuple[int, int], old_state: ExplorationState):
+        """
+            Updates the counters after the direction state of node changed from old_state.
+            :param node: 2-Tuple
+            :param old_state: ExplorationState before the change
+            :return: void
+            """
+        new_state = self.exploration_state(node)
+        if new_state == old_state:
+            return
+        for state, change in [(old_state, -1), (new_state, 1)]:
+            if state == ExplorationState.EXPLORED:
+                self.explored_count += change
+            elif state == ExplorationState.UNEXPLORED:
+                self.unexplored_count += change
+        if node in self.get_paths():
+            if old_state == ExplorationState.EXPLORED:
+                self.open_path_nodes += 1
+            elif new_state == ExplorationState.EXPLORED:
+                self.open_path_nodes -= 1
 
     def add_directions(self, node: Tuple[int, int], directions):
         """
-            Saves directions under the associated coordinates in a dictionary
+            Saves directions under the associated coordinates as undiscovered directions
             :param node: 2-Tuple, current_coordinates
-            :param directions: list of directions to be added to the dictionary
+            :param directions: list of directions to be added
             :return: void
             """
-        for direction in directions:
-            if node not in self.undiscovered_directions:
-                self.undiscovered_directions[node] = [direction]
-            else:
-                self.undiscovered_directions[node].append(direction)
-        try:
-            self.undiscovered_directions[node]
-        except KeyError:
-            self.undiscovered_directions[node] = []
-        if self.undiscovered_directions[node]:
+        if self.journal is not None:
+            self.journal.add_directions(node, directions)
+        old_state = self.exploration_state(node)
+        self.node_states.scan(node, directions)
+        self._update_exploration_counts(node, old_state)
+        if self.node_states.mask(node, UNDISCOVERED):
             # print('1114')
             self.unexplored_nodes.append(node)
 
     def update_direction(self, node: Tuple[int, int], direction_list: list[Direction]):
         """
-            Removes a direction from a node from the node_directions dictionary.
+            Removes a direction from a node from the undiscovered directions.
 
             Example:
                 delete_directions(((0, 3), Direction.NORTH))
@@ -221,11 +556,14 @@ class Planet:
             :param direction_list: list which contains the compared positions
             :return: void
             """
-        try:
-            self.undiscovered_directions[node[0]] = [direction for direction in self.undiscovered_directions[node[0]] if direction not in direction_list]
-        except KeyError:
-            pass
-            print(f'KeyError in delete_directions: Es gibt den Knoten {node[0]} noch gar nicht in undiscovered_directions!')
+        if self.node_states.is_scanned(node[0]):
+            if self.journal is not None:
+                self.journal.update_direction(node[0], direction_mask(direction_list))
+            old_state = self.exploration_state(node[0])
+            self.node_states.clear_bits(node[0], UNDISCOVERED, direction_mask(direction_list))
+            self._update_exploration_counts(node[0], old_state)
+        else:
+            logger.warning('KeyError in delete_directions: Es gibt den Knoten %s noch gar nicht in undiscovered_directions!', node[0])
 
     def pop_from_stack(self, node: Tuple[int, int]):
         """
@@ -233,14 +571,32 @@ class Planet:
             :param node: 2-Tuple, takes in current coordinates
             :return: void
             """
-        try:
-            if not self.undiscovered_directions[node]:
-                print('1135')
+        if self.node_states.is_scanned(node) and not self.node_states.mask(node, UNDISCOVERED):
+            logger.debug('1135')
+            if self.unexplored_nodes:
+                if self.journal is not None:
+                    self.journal.pop_from_stack(node)
                 self.unexplored_nodes.pop()
-        except KeyError:
-            pass
-        except IndexError:
-            pass
+
+    def push_unexplored(self, node: Tuple[int, int]):
+        """
+            Puts a node at the bottom of the stack of unexplored nodes, unless it is already on the stack.
+            :param node: 2-Tuple
+            :return: void
+            """
+        if self.journal is not None:
+            self.journal.push_unexplored(node)
+        self.unexplored_nodes.push_bottom(node)
+
+    def mark_visited(self, node: Tuple[int, int]):
+        """
+            Remembers that the robot has scanned node.
+            :param node: 2-Tuple
+            :return: void
+            """
+        if self.journal is not None:
+            self.journal.mark_visited(node)
+        self.visited_nodes[node] = True
 
     def next_unexplored_node_and_direction(self, start: Tuple[int, int]):
         """
@@ -249,8 +605,8 @@ class Planet:
             :return: Enum Type of Class Direction or None if fully explored.
             """
         try:
-            print(start)
-            print(self.unexplored_nodes)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('start %s, unexplored_nodes %s', start, list(self.unexplored_nodes))
             path = self.shortest_path(start, self.unexplored_nodes[-1])
             if path is None:
                 # print('1122')
@@ -271,43 +627,86 @@ class Planet:
             :param node: 2-Tuple, current coordinates.
             :return: Direction or None if fully explored
             """
-        try:
-            if self.undiscovered_directions[node]:
-                next_direction = self.undiscovered_directions[node][0]
-                # print('1128')
-                return next_direction
-        except KeyError:
-            # print('1129')
-            return None
+        undiscovered = self.node_states.undiscovered(node)
+        if undiscovered:
+            # print('1128')
+            return undiscovered[0]
+        return None
 
     def update_certain(self, next_direction: Direction, node: Tuple[int, int]):
         """
-            Updates the dictionary with the yet unvisited paths of the relating nodes (if the list in the dict is not empty).
-            :param next_direction: the actual direction that needs to be deleted out of the paths' dict.
+            Marks next_direction of node as visited and removes it from the undiscovered directions.
+            :param next_direction: the actual direction that needs to be deleted out of the undiscovered directions.
             :param node: 2-Tuple, current coordinates.
             :return: void
             """
-        try:
-            self.undiscovered_directions[node].pop(self.undiscovered_directions[node].index(next_direction))
-            if not self.undiscovered_directions[node]:
-                print('1134')
-                self.unexplored_nodes.pop(self.unexplored_nodes.index(node))
-        except ValueError:
+        if not self.node_states.is_scanned(node):
+            raise KeyError(node)
+        if next_direction is None:
+            return
+        if self.journal is not None:
+            self.journal.update_certain(next_direction, node)
+        bit = direction_mask([next_direction])
+        self.node_states.set_bits(node, VISITED, bit)
+        if not self.node_states.mask(node, UNDISCOVERED) & bit:
             # print('1133')
-            pass
+            return
+        self.node_states.clear_bits(node, UNDISCOVERED, bit)
+        self._update_exploration_counts(node, ExplorationState.UNEXPLORED)
+        if not self.node_states.mask(node, UNDISCOVERED):
+            logger.debug('1134')
+            self.unexplored_nodes.discard(node)
 
     def check_paths(self, node: Tuple[int, int], paths_list) -> list:
         """
             Checks if the current paths have already been visited.
             :param node: 2-Tuple, current coordinates
             :param paths_list: list of current outgoing paths added.
-            :return: list with the outgoing paths to be added to the undiscovered_paths dict.
+            :return: list with the outgoing paths to be added to the undiscovered directions.
             """
-        try:
-            filtered_list = [direction for direction in paths_list if direction not in self.get_paths()[node].keys()]
-            return filtered_list
-        except KeyError:
+        known = self.node_states.mask(node, KNOWN)
+        if not known:
             return paths_list
+        return [direction for direction in paths_list if not known & direction_mask([direction])]
+
+    def rebuild_indexes(self):
+        """
+            Recomputes everything derived from the paths and the node states (incoming paths, grid heuristic scale,
+            exploration counters) and drops the caches, e.g. after restoring them from a snapshot.
+            :return: void
+            """
+        self.incoming_paths = {}
+        self.min_weight_per_distance = None
+        for node, node_paths in self.get_paths().items():
+            for direction, (target, _, weight) in node_paths.items():
+                incoming = self.incoming_paths.setdefault(target, set())
+                if weight == -1:
+                    continue
+                incoming.add((node, direction))
+                distance = abs(node[0] - target[0]) + abs(node[1] - target[1])
+                if distance > 0 and (self.min_weight_per_distance is None
+                                     or weight / distance < self.min_weight_per_distance):
+                    self.min_weight_per_distance = weight / distance
+        self.explored_count = 0
+        self.unexplored_count = 0
+        for node in self.node_states:
+            state = self.exploration_state(node)
+            if state == ExplorationState.EXPLORED:
+                self.explored_count += 1
+            elif state == ExplorationState.UNEXPLORED:
+                self.unexplored_count += 1
+        self.open_path_nodes = sum(1 for node in self.get_paths()
+                                   if self.exploration_state(node) != ExplorationState.EXPLORED)
+        self.path_trees = {}
+        self.hierarchy = None
+        self.matrix = None
+
+    def exploration_snapshot(self):
+        """
+            Returns the direction state of all nodes as one array of 32 bit words, see node_state.py for the layout.
+            :return: (list of nodes, array of words), the i-th word belongs to the i-th node
+            """
+        return self.node_states.snapshot()
 
     def convert_direction(self, direction_deg) -> Optional[Direction]:
         """
@@ -328,5 +727,5 @@ class Planet:
         elif direction_deg is None:
             return None
         else:
-            print(f'Fehler bei Umwandlung des integers zu Direction.NORTH|EAST|SOUTH|WEST. '
-                  f'Die Zahl muss 0, 90, 180, oder 270 sein, nicht {direction_deg}.')
+            logger.error('Fehler bei Umwandlung des integers zu Direction.NORTH|EAST|SOUTH|WEST. '
+                         'Die Zahl muss 0, 90, 180, oder 270 sein, nicht %s.', direction_deg)
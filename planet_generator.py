@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+
+# Attention: Do not import the ev3dev.ev3 module in this file
+import math
+import random
+from collections import deque
+from typing import List, Tuple, Dict, Optional
+
+from planet import Direction, Planet
+
+
+Node = Tuple[int, int]
+Slot = Tuple[Node, Direction]
+# ground truth path: (start slot, end slot, weight), weight -1 if blocked
+GeneratedPath = Tuple[Slot, Slot, int]
+
+STEPS = {Direction.NORTH: (0, 1), Direction.EAST: (1, 0), Direction.SOUTH: (0, -1), Direction.WEST: (-1, 0)}
+
+
+def opposite(direction: Direction) -> Direction:
+    return Direction((int(direction) + 180) % 360)
+
+
+class GeneratedPlanet:
+    """
+    Ground truth of a generated planet: every path with both of its ends, like the server knows it.
+    """
+    def __init__(self, name: str, start: Slot, paths: List[GeneratedPath]):
+        """
+            :param name: String, planet name
+            :param start: (2-Tuple, Direction), start node and the direction the robot faces there
+            :param paths: List of (start slot, end slot, weight)
+            """
+        self.name = name
+        self.start = start
+        self.paths = paths
+        # both ends of every path: slot -> (other slot, weight)
+        self.slots: Dict[Slot, Tuple[Slot, int]] = {}
+        for start_slot, end_slot, weight in paths:
+            self.slots[start_slot] = (end_slot, weight)
+            self.slots[end_slot] = (start_slot, weight)
+        self.nodes: List[Node] = list(dict.fromkeys(slot[0] for slot in self.slots))
+
+    def directions(self, node: Node) -> List[Direction]:
+        """
+            :return: List[Direction], the directions with a path at node (what a node scan finds)
+            """
+        return [direction for direction in Direction if (node, direction) in self.slots]
+
+    def path_from(self, node: Node, direction: Direction) -> Optional[Tuple[Slot, int]]:
+        """
+            :return: (end slot, weight) of the path leaving node in direction or None
+            """
+        return self.slots.get((node, direction))
+
+    def to_planet(self, **planet_options) -> Planet:
+        """
+            :param planet_options: keyword arguments for Planet()
+            :return: Planet which knows every path
+            """
+        planet = Planet(**planet_options)
+        for start_slot, end_slot, weight in self.paths:
+            planet.add_path(start_slot, end_slot, weight)
+        return planet
+
+    def partial_planet(self, explored: float, **planet_options) -> Planet:
+        """
+            Returns the planet in the middle of an exploration: the share explored of the nodes closest to the start
+            (breadth first) has been scanned, the paths between them are known and their other directions are
+            still undiscovered.
+            :param explored: Float, share of scanned nodes
+            :param planet_options: keyword arguments for Planet()
+            :return: Planet
+            """
+        scanned = []
+        seen = {self.start[0]}
+        queue = deque([self.start[0]])
+        count = max(1, round(explored * len(self.nodes)))
+        while queue and len(scanned) < count:
+            node = queue.popleft()
+            scanned.append(node)
+            for direction in self.directions(node):
+                (other, _), weight = self.slots[(node, direction)]
+                if weight != -1 and other not in seen:
+                    seen.add(other)
+                    queue.append(other)
+        scanned_set = set(scanned)
+        planet = Planet(**planet_options)
+        for start_slot, end_slot, weight in self.paths:
+            if start_slot[0] in scanned_set and end_slot[0] in scanned_set:
+                planet.add_path(start_slot, end_slot, weight)
+        for node in scanned:
+            planet.add_directions(node, [direction for direction in self.directions(node)
+                                         if self.slots[(node, direction)][0][0] not in scanned_set])
+            planet.mark_visited(node)
+        return planet
+
+
+def generate_planet(nodes: int, seed: int = 0, extra: float = 0.3, blocked: float = 0.08, loops: float = 0.03,
+                    long_paths: float = 0.05, max_weight: int = 3, name: Optional[str] = None) -> GeneratedPlanet:
+    """
+        Generates a planet in the shape of the server's worlds: nodes on grid coordinates with up to four paths,
+        straight paths between grid neighbours, longer curved paths, loops back to the same node, blocked paths
+        and varying weights. All nodes are connected by free paths. The same seed always gives the same planet.
+        :param nodes: Integer, number of nodes (10 to 100k and more)
+        :param seed: Integer
+        :param extra: Float, probability of a path between grid neighbours beyond the spanning tree
+        :param blocked: Float, share of the paths beyond the spanning tree which are blocked
+        :param loops: Float, share of nodes with a path back to themselves
+        :param long_paths: Float, share of nodes with a curved path to a node up to three grid units away
+        :param max_weight: Integer, the weight of a path is its grid length times 1 to max_weight
+        :param name: String, planet name, defaults to one built from nodes and seed
+        :return: GeneratedPlanet
+        """
+    rng = random.Random(seed)
+    side = max(2, math.ceil(math.sqrt(nodes)))
+    cells = [(x, y) for y in range(side) for x in range(side)][:nodes]
+    cell_set = set(cells)
+    used = set()
+    paths: List[GeneratedPath] = []
+
+    def connect(start: Slot, end: Slot, weight: int):
+        used.add(start)
+        used.add(end)
+        paths.append((start, end, weight))
+
+    def grid_weight(length: int) -> int:
+        return length * rng.randint(1, max_weight)
+
+    # random spanning tree over the grid neighbours, its paths are never blocked
+    tree = {cells[0]}
+    frontier = [(cells[0], direction) for direction in Direction]
+    while frontier:
+        node, direction = frontier.pop(rng.randrange(len(frontier)))
+        dx, dy = STEPS[direction]
+        neighbour = (node[0] + dx, node[1] + dy)
+        if neighbour not in cell_set or neighbour in tree:
+            continue
+        tree.add(neighbour)
+        connect((node, direction), (neighbour, opposite(direction)), grid_weight(1))
+        frontier.extend((neighbour, next_direction) for next_direction in Direction)
+
+    def weight_or_blocked(length: int) -> int:
+        return -1 if rng.random() < blocked else grid_weight(length)
+
+    for node in cells:
+        for direction in (Direction.NORTH, Direction.EAST):
+            dx, dy = STEPS[direction]
+            neighbour = (node[0] + dx, node[1] + dy)
+            slot, other = (node, direction), (neighbour, opposite(direction))
+            if neighbour in cell_set and slot not in used and other not in used and rng.random() < extra:
+                connect(slot, other, weight_or_blocked(1))
+
+    for node in cells:
+        free = [direction for direction in Direction if (node, direction) not in used]
+        if len(free) >= 2 and rng.random() < loops:
+            first, second = rng.sample(free, 2)
+            connect((node, first), (node, second), rng.randint(1, max_weight))
+            free = [direction for direction in free if direction not in (first, second)]
+        if free and rng.random() < long_paths:
+            dx, dy = rng.randint(-3, 3), rng.randint(-3, 3)
+            target = (node[0] + dx, node[1] + dy)
+            target_free = [direction for direction in Direction if (target, direction) not in used]
+            if target != node and target in cell_set and target_free:
+                connect((node, rng.choice(free)), (target, rng.choice(target_free)),
+                        weight_or_blocked(abs(dx) + abs(dy) + 1))
+
+    # the robot faces a path at the start, the start line behind it is not part of the planet
+    start_directions = [direction for direction in Direction
+                        if (cells[0], direction) in used and (cells[0], opposite(direction)) not in used] or \
+                       [direction for direction in Direction if (cells[0], direction) in used]
+    start = (cells[0], rng.choice(start_directions) if start_directions else Direction.NORTH)
+    return GeneratedPlanet(name or f'generated-{nodes}-{seed}', start, paths)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+# Attention: Do not import the ev3dev.ev3 module in this file
+import logging
+import os
+import queue
+from collections.abc import MappingView
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+# every subsystem logs to its own child of this logger, e.g. 'RoboLab.planet'
+ROOT = 'RoboLab'
+SUBSYSTEMS = ('main', 'communication', 'planet', 'movement')
+FORMAT = '%(asctime)s %(name)s %(levelname)s: %(message)s'
+
+# arguments of these types may change before the writer thread gets to them
+MUTABLE = (list, dict, set, bytearray, MappingView)
+
+_listener: Optional[QueueListener] = None
+_handler: Optional[QueueHandler] = None
+
+
+class ThreadQueueHandler(QueueHandler):
+    """
+    Hands the records to the writer thread unformatted. Only records with mutable arguments get their message
+    merged here, so that later changes of those arguments do not show up in the log.
+    """
+    def prepare(self, record):
+        if isinstance(record.args, tuple) and any(isinstance(arg, MUTABLE) for arg in record.args):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+def get_logger(subsystem: str) -> logging.Logger:
+    """
+        :param subsystem: String, one of SUBSYSTEMS
+        :return: logging.Logger of the subsystem
+        """
+    return logging.getLogger(f'{ROOT}.{subsystem}')
+
+
+def parse_levels(text: str) -> Dict[str, int]:
+    """
+        Parses levels per subsystem like "planet=DEBUG,communication=WARNING" (e.g. from ROBOLAB_LOG_LEVELS).
+        :return: Dict subsystem -> logging level
+        """
+    levels = {}
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        subsystem, _, level = item.partition('=')
+        levels[subsystem.strip()] = logging.getLevelName(level.strip().upper())
+        if not isinstance(levels[subsystem.strip()], int):
+            raise ValueError(f'unknown log level in {item!r}')
+    return levels
+
+
+def start_logging(log_file: Optional[str] = None, level: int = logging.INFO, console_level: Optional[int] = None,
+                  levels: Optional[Dict[str, int]] = None) -> QueueListener:
+    """
+        Routes all records of the RoboLab loggers through a queue to a background thread which writes them, so that
+        neither the MQTT callback thread nor the control loop waits for the file or the console.
+        :param log_file: String, file for all records or None
+        :param level: Integer, default level of the subsystems
+        :param console_level: Integer, level from which records are also printed or None for no console output
+        :param levels: Dict subsystem -> level, overrides level for single subsystems, the environment variable
+        ROBOLAB_LOG_LEVELS (see parse_levels) overrides both
+        :return: QueueListener, running
+        """
+    global _listener, _handler
+    stop_logging()
+    formatter = logging.Formatter(FORMAT)
+    handlers = []
+    if log_file is not None:
+        file_handler = logging.FileHandler(log_file)
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+    if console_level is not None:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter('%(message)s'))
+        console_handler.setLevel(console_level)
+        handlers.append(console_handler)
+    record_queue = queue.SimpleQueue()
+    _handler = ThreadQueueHandler(record_queue)
+    root = logging.getLogger(ROOT)
+    root.addHandler(_handler)
+    root.setLevel(level)
+    root.propagate = False
+    subsystem_levels = dict(levels or {})
+    subsystem_levels.update(parse_levels(os.environ.get('ROBOLAB_LOG_LEVELS', '')))
+    for subsystem in SUBSYSTEMS:
+        get_logger(subsystem).setLevel(subsystem_levels.get(subsystem, logging.NOTSET))
+    _listener = QueueListener(record_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """
+        Writes the records still in the queue and stops the writer thread.
+        :return: void
+        """
+    global _listener, _handler
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _handler is not None:
+        logging.getLogger(ROOT).removeHandler(_handler)
+        _handler = None
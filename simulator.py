@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+
+# Attention: Do not import the ev3dev.ev3 module in this file
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import random
+import sys
+import time
+from collections import deque
+from typing import List, Dict, Optional, Tuple
+
+from planet import Direction
+import robot_log
+from planet_generator import GeneratedPlanet, generate_planet, opposite
+
+
+class SimulationError(Exception):
+    """
+    The simulated robot did something the real one could not, e.g. drive into a direction without a path.
+    """
+    pass
+
+
+class SimulatedMessage:
+    """
+    Stand-in for paho.mqtt.client.MQTTMessage, Communication.on_message only reads topic and payload.
+    """
+    __slots__ = ('topic', 'payload')
+
+    def __init__(self, topic: str, payload: bytes):
+        self.topic = topic
+        self.payload = payload
+
+
+class PlanetServer:
+    """
+    Local stand-in for the planet server and the MQTT broker. It has the interface of paho.mqtt.client.Client which
+    Communication uses, so the real Communication can be handed this object instead of the client.
+    Every published message is answered at once (in the same call) from the ground truth of a GeneratedPlanet with
+    the messages of the server protocol: planet, path, pathSelect, pathUnveiled, target and done.
+    Like the broker, messages on subscribed topics are delivered back to the client as well.
+    """
+    def __init__(self, ground_truth: GeneratedPlanet, seed: int = 0, target: Optional[Tuple[int, int]] = None,
+                 target_after: int = 1, unveil_rate: float = 0.0, override_rate: float = 0.0,
+                 unveil_while_driving: bool = False):
+        """
+            :param ground_truth: GeneratedPlanet, the planet the robot drives on
+            :param seed: Integer, seed of the unveiled paths and the overridden path selections
+            :param target: 2-Tuple, target node sent with a target message or None for a pure exploration
+            :param target_after: Integer, number of path messages before the target is sent
+            :param unveil_rate: Float, probability of a pathUnveiled message after each path message
+            :param override_rate: Float, probability that the server answers a pathSelect with another direction
+            :param unveil_while_driving: bool, the pathUnveiled messages come while the robot drives (see
+            drive_started) instead of right after the path messages
+            """
+        self.ground_truth = ground_truth
+        self.rng = random.Random(seed)
+        self.target = target
+        self.target_after = target_after
+        self.unveil_rate = unveil_rate
+        self.override_rate = override_rate
+        self.unveil_while_driving = unveil_while_driving
+        self.on_message = None
+        self.subscriptions = set()
+        self.connected = False
+        self.planet_name = ground_truth.name
+        self.path_messages = 0
+        # slots of the paths which the robot got from a path or pathUnveiled message
+        self.revealed = set()
+        self.messages_received = 0
+        self.messages_sent = 0
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.done = None
+
+    # interface of paho.mqtt.client.Client used by Communication and main
+    # noinspection PyUnusedLocal
+    def tls_set(self, *args, **kwargs):
+        pass
+
+    # noinspection PyUnusedLocal
+    def username_pw_set(self, *args, **kwargs):
+        pass
+
+    # noinspection PyUnusedLocal
+    def connect(self, *args, **kwargs):
+        self.connected = True
+
+    # noinspection PyUnusedLocal
+    def subscribe(self, topic: str, qos: int = 0):
+        self.subscriptions.add(topic)
+
+    def loop_start(self):
+        pass
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        self.connected = False
+
+    def is_connected(self) -> bool:
+        return self.connected
+
+    # noinspection PyUnusedLocal
+    def publish(self, topic: str, payload, qos: int = 0):
+        """
+            Receives a message of the client and sends the answers of the server.
+            :param topic: String
+            :param payload: String or bytes, encoded JSON
+            :return: void
+            """
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        self.messages_received += 1
+        self.bytes_received += len(payload)
+        self._deliver(topic, payload)
+        message = json.loads(payload)
+        handler = getattr(self, '_on_' + message['type'], None)
+        if handler is None:
+            raise SimulationError(f'unknown message type {message["type"]!r} on {topic}')
+        handler(message.get('payload', {}))
+
+    def _deliver(self, topic: str, payload: bytes):
+        if topic in self.subscriptions and self.on_message is not None:
+            self.on_message(self, None, SimulatedMessage(topic, payload))
+
+    def _send(self, topic: str, message_type: str, payload: Dict):
+        data = json.dumps({'from': 'server', 'type': message_type, 'payload': payload}).encode('utf-8')
+        self.messages_sent += 1
+        self.bytes_sent += len(data)
+        self._deliver(topic, data)
+
+    def _planet_topic(self) -> str:
+        return f'planet/{self.planet_name}/127'
+
+    def _on_testPlanet(self, payload: Dict):
+        # the ground truth does not change, the name is only used for the topics
+        self.planet_name = payload['planetName']
+
+    # noinspection PyUnusedLocal
+    def _on_ready(self, payload: Dict):
+        (x, y), orientation = self.ground_truth.start
+        self._send('explorer/127', 'planet', {'planetName': self.planet_name, 'startX': x, 'startY': y,
+                                               'startOrientation': int(orientation)})
+
+    def _on_path(self, payload: Dict):
+        start = (payload['startX'], payload['startY'])
+        start_direction = Direction(payload['startDirection'])
+        driven = self.ground_truth.path_from(start, start_direction)
+        if driven is None:
+            raise SimulationError(f'there is no path at {start} in direction {start_direction}')
+        ((end_x, end_y), end_direction), weight = driven
+        if payload['pathStatus'] == 'blocked' or weight == -1:
+            # the robot turned around at the obstacle, the server confirms the path back to the start
+            end_x, end_y = start
+            end_direction = start_direction
+            weight = -1
+        self.revealed.add((start, start_direction))
+        self.revealed.add(((end_x, end_y), end_direction))
+        self._send(self._planet_topic(), 'path',
+                   {'startX': start[0], 'startY': start[1], 'startDirection': int(start_direction),
+                    'endX': end_x, 'endY': end_y, 'endDirection': int(end_direction),
+                    'pathStatus': 'blocked' if weight == -1 else 'free', 'pathWeight': weight})
+        self.path_messages += 1
+        if not self.unveil_while_driving and self.unveil_rate and self.rng.random() < self.unveil_rate:
+            self._unveil()
+        if self.target is not None and self.path_messages == self.target_after:
+            self._send(self._planet_topic(), 'target', {'targetX': self.target[0], 'targetY': self.target[1]})
+
+    def drive_started(self):
+        """
+            Called by SimulatedMovement when the robot starts driving a path, with unveil_while_driving a pathUnveiled
+            message may arrive before the robot sends its path.
+            :return: void
+            """
+        if self.unveil_while_driving and self.unveil_rate and self.rng.random() < self.unveil_rate:
+            self._unveil()
+
+    def _unveil(self):
+        hidden = [path for path in self.ground_truth.paths if path[0] not in self.revealed]
+        if not hidden:
+            return
+        ((start_x, start_y), start_direction), ((end_x, end_y), end_direction), weight = self.rng.choice(hidden)
+        self.revealed.add(((start_x, start_y), start_direction))
+        self.revealed.add(((end_x, end_y), end_direction))
+        self._send(self._planet_topic(), 'pathUnveiled',
+                   {'startX': start_x, 'startY': start_y, 'startDirection': int(start_direction),
+                    'endX': end_x, 'endY': end_y, 'endDirection': int(end_direction),
+                    'pathStatus': 'blocked' if weight == -1 else 'free', 'pathWeight': weight})
+
+    def _on_pathSelect(self, payload: Dict):
+        if not self.override_rate or self.rng.random() >= self.override_rate:
+            return
+        node = (payload['startX'], payload['startY'])
+        others = [direction for direction in self.ground_truth.directions(node)
+                  if direction != payload['startDirection']]
+        if others:
+            self._send(self._planet_topic(), 'pathSelect', {'startDirection': int(self.rng.choice(others))})
+
+    def _on_targetReached(self, payload: Dict):
+        self.done = payload.get('message', '')
+        self._send('explorer/127', 'done', {'message': self.done})
+
+    def _on_explorationCompleted(self, payload: Dict):
+        self.done = payload.get('message', '')
+        self._send('explorer/127', 'done', {'message': self.done})
+
+
+class SimulatedMovement:
+    """
+    Movement backend which drives on the ground truth of a GeneratedPlanet instead of the motors.
+    Like the real robot it only knows its position through what it drives: turns and node scans are relative to
+    the orientation main.py believes the robot has, so a wrong belief gives the same wrong results as on the planet.
+    """
+    def __init__(self, ground_truth: GeneratedPlanet, max_paths: int = 10000, server: Optional[PlanetServer] = None):
+        """
+            :param ground_truth: GeneratedPlanet, the planet the robot drives on
+            :param max_paths: Integer, the mission is aborted with a SimulationError after this many paths
+            :param server: PlanetServer which is told when the robot starts driving a path or None
+            """
+        self.ground_truth = ground_truth
+        self.max_paths = max_paths
+        self.server = server
+        # same attributes as Movement
+        self.obstacle = False
+        self.current_path_status = "free"
+        self.to_start_node = True
+        # actual position and heading of the robot
+        self.node, self.heading = ground_truth.start
+        self.weight_driven = 0
+        self.paths_driven = 0
+        self.blocked_paths_driven = 0
+        self.turns = 0
+        self.node_scans = 0
+        self.visits = {self.node: 1}
+        self.finished = False
+        self.on_start_line = True
+
+    def linefollow(self):
+        """
+            Drives the path in front of the robot to the next node, or back to the current node if it is blocked.
+            :return: String "free" or "blocked"
+            """
+        self.obstacle = False
+        self.current_path_status = "free"
+        if self.on_start_line:
+            # from the start line onto the start node, the position is already the start node
+            self.on_start_line = False
+            return self.current_path_status
+        if self.paths_driven >= self.max_paths:
+            raise SimulationError(f'mission aborted after {self.paths_driven} paths')
+        if self.server is not None:
+            self.server.drive_started()
+        driven = self.ground_truth.path_from(self.node, self.heading)
+        if driven is None:
+            raise SimulationError(f'there is no path at {self.node} in direction {self.heading}')
+        (end, end_direction), weight = driven
+        self.paths_driven += 1
+        if weight == -1:
+            self.obstacle = True
+            self.current_path_status = "blocked"
+            self.blocked_paths_driven += 1
+            self.heading = opposite(self.heading)
+        else:
+            self.weight_driven += weight
+            self.node = end
+            self.heading = opposite(end_direction)
+        self.visits[self.node] = self.visits.get(self.node, 0) + 1
+        return self.current_path_status
+
+    def node_scan(self, current_orientation):
+        """
+            :param current_orientation: Direction the robot believes to face
+            :return: List of the directions with a path, in the order the rotating robot finds them
+            """
+        self.node_scans += 1
+        believed = int(current_orientation)
+        return [Direction((believed + offset) % 360) for offset in (90, 270, 0)
+                if (self.node, Direction((int(self.heading) + offset) % 360)) in self.ground_truth.slots]
+
+    def turn(self, next_direction, current_orientation):
+        if next_direction is None:
+            raise SimulationError(f'no direction to turn to at {self.node}')
+        turn_angle = (int(next_direction) - int(current_orientation)) % 360
+        if turn_angle:
+            self.turns += 1
+        self.heading = Direction((int(self.heading) + turn_angle) % 360)
+
+    def turnaround(self):
+        self.heading = opposite(self.heading)
+
+    def beep(self):
+        pass
+
+    def tetris(self):
+        self.finished = True
+
+
+class MissionResult:
+    """
+    Outcome of one simulated mission.
+    """
+    def __init__(self, planet_name: str, nodes: int, seed: int):
+        self.planet_name = planet_name
+        self.nodes = nodes
+        self.seed = seed
+        self.completed = False
+        self.target_reached = None
+        self.unexplored = 0
+        self.error = None
+        self.weight_driven = 0
+        self.paths_driven = 0
+        self.blocked_paths_driven = 0
+        self.node_visits = 0
+        self.turns = 0
+        self.messages_sent = 0
+        self.messages_received = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.seconds = 0.0
+
+    def as_dict(self) -> Dict:
+        return dict(vars(self))
+
+
+def _silence(stack: contextlib.ExitStack):
+    """
+        Discards the standard output and, unless logging was set up (robot_log.start_logging), the warnings of the
+        RoboLab loggers until stack is closed.
+        """
+    stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, 'w'))))
+    root = logging.getLogger(robot_log.ROOT)
+    if not root.handlers:
+        handler = logging.NullHandler()
+        root.addHandler(handler)
+        stack.callback(root.removeHandler, handler)
+
+
+def reachable_slots(ground_truth: GeneratedPlanet) -> List[Tuple[Tuple[int, int], Direction]]:
+    """
+        :return: slots of all nodes the robot can reach from the start, except the start line behind the start node
+        """
+    start, orientation = ground_truth.start
+    seen = {start}
+    queue = deque([start])
+    slots = []
+    while queue:
+        node = queue.popleft()
+        for direction in ground_truth.directions(node):
+            if node == start and direction == opposite(orientation):
+                continue
+            slots.append((node, direction))
+            (other, _), weight = ground_truth.slots[(node, direction)]
+            if weight != -1 and other not in seen:
+                seen.add(other)
+                queue.append(other)
+    return slots
+
+
+def run_mission(ground_truth: GeneratedPlanet, strategy=None, seed: int = 0,
+                target: Optional[Tuple[int, int]] = None, target_after: int = 1, unveil_rate: float = 0.0,
+                override_rate: float = 0.0, max_paths: int = 10000, quiet: bool = True,
+                unveil_while_driving: bool = False) -> MissionResult:
+    """
+        Runs main.run() headless against a PlanetServer and a SimulatedMovement on the ground truth.
+        :param ground_truth: GeneratedPlanet
+        :param strategy: ExplorationStrategy for main.py or None for its default
+        :param seed: Integer, seed of the server
+        :param target: 2-Tuple or None, see PlanetServer
+        :param target_after: Integer, see PlanetServer
+        :param unveil_rate: Float, see PlanetServer
+        :param override_rate: Float, see PlanetServer
+        :param max_paths: Integer, see SimulatedMovement
+        :param quiet: bool, discard the output of main.py
+        :param unveil_while_driving: bool, see PlanetServer
+        :return: MissionResult
+        """
+    import main
+
+    server = PlanetServer(ground_truth, seed, target, target_after, unveil_rate, override_rate, unveil_while_driving)
+    robot = SimulatedMovement(ground_truth, max_paths, server)
+    result = MissionResult(ground_truth.name, len(ground_truth.nodes), seed)
+    main.reset(strategy)
+    main.path_select_window = 0
+    start_time = time.perf_counter()
+    with contextlib.ExitStack() as stack:
+        if quiet:
+            _silence(stack)
+        try:
+            main.run(server, robot)
+        except SimulationError as e:
+            result.error = str(e)
+    result.seconds = time.perf_counter() - start_time
+    _collect(result, ground_truth, main.planet, server, robot, target)
+    return result
+
+
+def _collect(result: MissionResult, ground_truth: GeneratedPlanet, planet, server: PlanetServer,
+             robot: SimulatedMovement, target: Optional[Tuple[int, int]]):
+    known = planet.get_paths()
+    result.unexplored = sum(1 for node, direction in reachable_slots(ground_truth)
+                            if direction not in known.get(node, {}))
+    if target is not None:
+        result.target_reached = robot.node == tuple(target)
+        result.completed = result.error is None and result.target_reached
+    else:
+        result.completed = result.error is None and result.unexplored == 0
+    result.weight_driven = robot.weight_driven
+    result.paths_driven = robot.paths_driven
+    result.blocked_paths_driven = robot.blocked_paths_driven
+    result.node_visits = sum(robot.visits.values())
+    result.turns = robot.turns
+    result.messages_sent = server.messages_received
+    result.messages_received = server.messages_sent
+    result.bytes_sent = server.bytes_received
+    result.bytes_received = server.bytes_sent
+
+
+async def run_mission_async(ground_truth: GeneratedPlanet, strategy=None, seed: int = 0,
+                            target: Optional[Tuple[int, int]] = None, target_after: int = 1, unveil_rate: float = 0.0,
+                            override_rate: float = 0.0, max_paths: int = 10000, speculate: bool = True,
+                            unveil_while_driving: bool = False) -> MissionResult:
+    """
+        Like run_mission, but with the asyncio MissionController of controller.py instead of main.run.
+        :param speculate: bool, see MissionController
+        :return: MissionResult
+        """
+    from controller import MissionController
+
+    server = PlanetServer(ground_truth, seed, target, target_after, unveil_rate, override_rate, unveil_while_driving)
+    robot = SimulatedMovement(ground_truth, max_paths, server)
+    result = MissionResult(ground_truth.name, len(ground_truth.nodes), seed)
+    mission = MissionController(server, robot, strategy, path_select_window=0, speculate=speculate)
+    start_time = time.perf_counter()
+    try:
+        await mission.run()
+    except SimulationError as e:
+        result.error = str(e)
+    result.seconds = time.perf_counter() - start_time
+    _collect(result, ground_truth, mission.state.planet, server, robot, target)
+    return result
+
+
+def run_missions_async(ground_truths: List[GeneratedPlanet], quiet: bool = True, **options) -> List[MissionResult]:
+    """
+        Runs one MissionController per ground truth, all at the same time in one event loop.
+        :param ground_truths: List of GeneratedPlanet
+        :param quiet: bool, discard the output of the planet
+        :param options: keyword arguments for run_mission_async (seed i is used for ground_truths[i])
+        :return: List of MissionResult in the order of ground_truths
+        """
+    async def run_all():
+        return await asyncio.gather(*(run_mission_async(ground_truth, seed=seed, **options)
+                                      for seed, ground_truth in enumerate(ground_truths)))
+
+    with contextlib.ExitStack() as stack:
+        if quiet:
+            _silence(stack)
+        return asyncio.run(run_all())
+
+
+def main_cli(arguments: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Headless missions of main.py on generated planets')
+    parser.add_argument('--nodes', type=int, nargs='+', default=[10, 50, 200])
+    parser.add_argument('--seeds', type=int, default=5, help='missions per planet size, seeds 0 to n-1')
+    parser.add_argument('--unveil-rate', type=float, default=0.0)
+    parser.add_argument('--override-rate', type=float, default=0.0)
+    parser.add_argument('--unveil-while-driving', action='store_true',
+                        help='the pathUnveiled messages arrive while the robot drives instead of after the path messages')
+    parser.add_argument('--controller', action='store_true',
+                        help='run the missions with the asyncio MissionController of controller.py instead of main.run')
+    parser.add_argument('--output', help='JSON file with one result per mission, default standard output')
+    args = parser.parse_args(arguments)
+
+    options = dict(unveil_rate=args.unveil_rate, override_rate=args.override_rate,
+                   unveil_while_driving=args.unveil_while_driving)
+    results = []
+    for nodes in args.nodes:
+        ground_truths = [generate_planet(nodes, seed) for seed in range(args.seeds)]
+        if args.controller:
+            results.extend(result.as_dict() for result in run_missions_async(ground_truths, **options))
+        else:
+            results.extend(run_mission(ground_truth, seed=seed, **options).as_dict()
+                           for seed, ground_truth in enumerate(ground_truths))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    return 0 if all(result['completed'] for result in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main_cli())
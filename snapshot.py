@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+
+# Attention: Do not import the ev3dev.ev3 module in this file
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from typing import List, Tuple, Iterator, Optional
+
+from frontier import Frontier
+from path_store import ArrayPathStore
+from planet import Direction, Planet
+
+
+# Snapshot file, little endian, every section is a flat array:
+#   header                 magic, version, reserved, generation, path nodes P, state nodes S, frontier F, visited V
+#   path nodes    i[2P]    x, y of the nodes with paths, in the order of Planet.get_paths()
+#   targets       i[4P]    per node and direction / 90: index of the end node or -1 (the ArrayPathStore layout)
+#   weights       i[4P]
+#   state nodes   i[2S]    x, y of the nodes of Planet.node_states
+#   words         I[S]     their state words, see node_state.py
+#   frontier      i[2F]    Planet.unexplored_nodes from bottom to top
+#   visited       i[2V]    Planet.visited_nodes
+#   order         H[P]     direction order codes, see path_store.py
+#   free order    H[P]
+#   target dirs   b[4P]    direction / 90 at the end of every path
+#   blocked       B[P]     masks of the blocked directions
+SNAPSHOT_MAGIC = b'RLPS'
+JOURNAL_MAGIC = b'RLPJ'
+VERSION = 1
+SNAPSHOT_HEADER = struct.Struct('<4sHHIIIII')
+JOURNAL_HEADER = struct.Struct('<4sHHI')
+# operation, node, direction / 90, other node, other direction / 90, value (-1 for unused directions)
+RECORD = struct.Struct('<Biibiibi')
+
+ADD_PATH = 1
+ADD_DIRECTIONS = 2
+UPDATE_DIRECTION = 3
+POP_FROM_STACK = 4
+UPDATE_CERTAIN = 5
+PUSH_UNEXPLORED = 6
+MARK_VISITED = 7
+
+
+def planet_file(name: str, directory: str, extension: str) -> str:
+    """
+        :param name: String, planet name (Communication.current_planet)
+        :param directory: String
+        :param extension: String, 'snapshot' or 'journal'
+        :return: String, path of the file belonging to the planet
+        """
+    return os.path.join(directory, re.sub(r'[^A-Za-z0-9_.-]', '_', name) + '.' + extension)
+
+
+def _to_bytes(values: array) -> bytes:
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _nodes(coordinates: array) -> List[Tuple[int, int]]:
+    return list(zip(coordinates[0::2], coordinates[1::2]))
+
+
+def _coordinates(nodes) -> array:
+    return array('i', [value for node in nodes for value in node])
+
+
+def save_snapshot(planet: Planet, path: str, generation: int = 0):
+    """
+        Writes the paths and the exploration state of planet to path. The file is replaced atomically.
+        :param planet: Planet
+        :param path: String
+        :param generation: Integer, generation of the journal which continues this snapshot
+        :return: void
+        """
+    store = planet.paths
+    if isinstance(store, ArrayPathStore):
+        path_nodes = store.nodes
+        targets, weights, target_directions = store.targets, store.weights, store.target_directions
+        order, free_order, blocked = store.order, store.free_order, store.blocked
+    else:
+        paths = planet.get_paths()
+        path_nodes = list(paths)
+        ids = {node: node_id for node_id, node in enumerate(path_nodes)}
+        targets = array('i', [-1]) * (4 * len(path_nodes))
+        weights = array('i', bytes(16 * len(path_nodes)))
+        target_directions = array('b', bytes(4 * len(path_nodes)))
+        order = array('H', bytes(2 * len(path_nodes)))
+        free_order = array('H', bytes(2 * len(path_nodes)))
+        blocked = array('B', bytes(len(path_nodes)))
+        for node_id, node in enumerate(path_nodes):
+            for direction, (target, target_direction, weight) in paths[node].items():
+                index = int(direction) // 90
+                slot = node_id * 4 + index
+                targets[slot] = ids[target]
+                target_directions[slot] = int(target_direction) // 90
+                weights[slot] = weight
+                order[node_id] += (index << (3 + 2 * (order[node_id] & 7))) + 1
+                if weight == -1:
+                    blocked[node_id] |= 1 << index
+                else:
+                    free_order[node_id] += (index << (3 + 2 * (free_order[node_id] & 7))) + 1
+
+    state_nodes, words = planet.node_states.snapshot()
+    frontier = list(planet.unexplored_nodes)
+    visited = list(planet.visited_nodes)
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, VERSION, 0, generation, len(path_nodes), len(state_nodes),
+                                        len(frontier), len(visited)))
+        for section in [_coordinates(path_nodes), targets, weights, _coordinates(state_nodes), words,
+                        _coordinates(frontier), _coordinates(visited), order, free_order, target_directions, blocked]:
+            file.write(_to_bytes(section))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+
+def load_snapshot(path: str, **planet_options) -> Tuple[Planet, int]:
+    """
+        Reads a snapshot written by save_snapshot. The file is memory mapped and every section is copied
+        into its array in one piece. The dict storage gets its dicts built in one pass (DictPathStore.load),
+        only the derived indexes of the planet are rebuilt node by node.
+        :param path: String
+        :param planet_options: keyword arguments for Planet()
+        :return: (Planet, generation of the journal which continues the snapshot)
+        """
+    planet = Planet(**planet_options)
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        magic, version, _, generation, path_count, state_count, frontier_count, visited_count = \
+            SNAPSHOT_HEADER.unpack_from(data, 0)
+        if magic != SNAPSHOT_MAGIC or version != VERSION:
+            raise ValueError(f'{path} is no planet snapshot of version {VERSION}')
+        offset = SNAPSHOT_HEADER.size
+        sections = []
+        with memoryview(data) as view:
+            for typecode, count in [('i', 2 * path_count), ('i', 4 * path_count), ('i', 4 * path_count),
+                                    ('i', 2 * state_count), ('I', state_count), ('i', 2 * frontier_count),
+                                    ('i', 2 * visited_count), ('H', path_count), ('H', path_count),
+                                    ('b', 4 * path_count), ('B', path_count)]:
+                values = array(typecode)
+                size = values.itemsize * count
+                values.frombytes(view[offset:offset + size])
+                if sys.byteorder == 'big':
+                    values.byteswap()
+                sections.append(values)
+                offset += size
+    (path_nodes, targets, weights, state_nodes, words, frontier, visited, order, free_order,
+     target_directions, blocked) = sections
+    path_nodes = _nodes(path_nodes)
+
+    store = planet.paths
+    if isinstance(store, ArrayPathStore):
+        store.nodes = path_nodes
+        store.ids = {node: node_id for node_id, node in enumerate(path_nodes)}
+        store.targets, store.weights, store.target_directions = targets, weights, target_directions
+        store.order, store.free_order, store.blocked = order, free_order, blocked
+    else:
+        directions = tuple(Direction)
+        paths = {}
+        for node_id, node in enumerate(path_nodes):
+            code = order[node_id]
+            if code & 7:
+                node_paths = paths[node] = {}
+                for position in range(code & 7):
+                    slot = node_id * 4 + (code >> (3 + 2 * position) & 3)
+                    node_paths[directions[slot & 3]] = (path_nodes[targets[slot]], directions[target_directions[slot]],
+                                                        weights[slot])
+        store.load(paths)
+
+    states = planet.node_states
+    states.nodes = _nodes(state_nodes)
+    states.ids = {node: node_id for node_id, node in enumerate(states.nodes)}
+    states.words = words
+    planet.unexplored_nodes = Frontier(_nodes(frontier))
+    planet.visited_nodes = dict.fromkeys(_nodes(visited), True)
+    planet.rebuild_indexes()
+    return planet, generation
+
+
+class PlanetJournal:
+    """
+    Append-only log of the changes of a planet since its last snapshot, one fixed size record per change.
+    A record cut off by a crash is ignored when the journal is read.
+    """
+    def __init__(self, path: str, generation: int = 0, sync: bool = False):
+        """
+            Opens the journal for appending and starts a new one if the file is missing or of another generation.
+            :param path: String
+            :param generation: Integer, generation of the snapshot the journal continues
+            :param sync: bool, fsync after every record (survives power loss, but slower)
+            """
+        self.path = path
+        self.generation = generation
+        self.sync = sync
+        if read_generation(path) != generation:
+            self._start()
+        else:
+            # drops a record cut off by a crash, the next one would be misaligned otherwise
+            size = os.path.getsize(path)
+            os.truncate(path, size - (size - JOURNAL_HEADER.size) % RECORD.size)
+        self.file = open(path, 'ab', buffering=0)
+
+    def _start(self):
+        with open(self.path, 'wb') as file:
+            file.write(JOURNAL_HEADER.pack(JOURNAL_MAGIC, VERSION, 0, self.generation))
+
+    def record(self, operation: int, node: Tuple[int, int], direction: Optional[Direction] = None,
+               other: Tuple[int, int] = (0, 0), other_direction: Optional[Direction] = None, value: int = 0):
+        """
+            Appends one record.
+            :return: void
+            """
+        self.file.write(RECORD.pack(operation, node[0], node[1], -1 if direction is None else int(direction) // 90,
+                                    other[0], other[1], -1 if other_direction is None else int(other_direction) // 90,
+                                    value))
+        if self.sync:
+            os.fsync(self.file.fileno())
+
+    def add_path(self, start: Tuple[Tuple[int, int], Direction], target: Tuple[Tuple[int, int], Direction], weight: int):
+        self.record(ADD_PATH, start[0], start[1], target[0], target[1], weight)
+
+    def add_directions(self, node: Tuple[int, int], directions):
+        # the directions in the order given, packed like the order codes of path_store.py
+        code = 0
+        for direction in dict.fromkeys(directions):
+            code += ((int(direction) // 90) << (3 + 2 * (code & 7))) + 1
+        self.record(ADD_DIRECTIONS, node, value=code)
+
+    def update_direction(self, node: Tuple[int, int], mask: int):
+        self.record(UPDATE_DIRECTION, node, value=mask)
+
+    def pop_from_stack(self, node: Tuple[int, int]):
+        self.record(POP_FROM_STACK, node)
+
+    def update_certain(self, direction: Direction, node: Tuple[int, int]):
+        self.record(UPDATE_CERTAIN, node, direction)
+
+    def push_unexplored(self, node: Tuple[int, int]):
+        self.record(PUSH_UNEXPLORED, node)
+
+    def mark_visited(self, node: Tuple[int, int]):
+        self.record(MARK_VISITED, node)
+
+    def reset(self, generation: int):
+        """
+            Empties the journal after a snapshot of the given generation has been written.
+            :return: void
+            """
+        self.file.close()
+        self.generation = generation
+        self._start()
+        self.file = open(self.path, 'ab', buffering=0)
+
+    def close(self):
+        self.file.close()
+
+
+def read_generation(path: str) -> Optional[int]:
+    """
+        :return: generation of the journal at path or None if there is no valid journal
+        """
+    try:
+        with open(path, 'rb') as file:
+            header = file.read(JOURNAL_HEADER.size)
+    except FileNotFoundError:
+        return None
+    if len(header) < JOURNAL_HEADER.size:
+        return None
+    magic, version, _, generation = JOURNAL_HEADER.unpack(header)
+    if magic != JOURNAL_MAGIC or version != VERSION:
+        return None
+    return generation
+
+
+def read_journal(path: str) -> Iterator[Tuple[int, Tuple[int, int], Optional[Direction], Tuple[int, int], Optional[Direction], int]]:
+    """
+        Yields the complete records of a journal as (operation, node, direction, other node, other direction, value).
+        """
+    with open(path, 'rb') as file:
+        data = file.read()
+    directions = tuple(Direction)
+    end = len(data) - (len(data) - JOURNAL_HEADER.size) % RECORD.size
+    for operation, x, y, direction, other_x, other_y, other_direction, value in \
+            RECORD.iter_unpack(data[JOURNAL_HEADER.size:end]):
+        yield (operation, (x, y), None if direction == -1 else directions[direction],
+               (other_x, other_y), None if other_direction == -1 else directions[other_direction], value)
+
+
+def replay_journal(planet: Planet, path: str):
+    """
+        Applies the records of a journal to planet without journaling them again.
+        :return: void
+        """
+    journal, planet.journal = planet.journal, None
+    directions = tuple(Direction)
+    for operation, node, direction, other, other_direction, value in read_journal(path):
+        if operation == ADD_PATH:
+            planet.add_path((node, direction), (other, other_direction), value)
+        elif operation == ADD_DIRECTIONS:
+            planet.add_directions(node, [directions[value >> (3 + 2 * position) & 3]
+                                         for position in range(value & 7)])
+        elif operation == UPDATE_DIRECTION:
+            planet.update_direction((node,), [direction for index, direction in enumerate(directions)
+                                              if value >> index & 1])
+        elif operation == POP_FROM_STACK:
+            planet.pop_from_stack(node)
+        elif operation == UPDATE_CERTAIN:
+            planet.update_certain(direction, node)
+        elif operation == PUSH_UNEXPLORED:
+            planet.push_unexplored(node)
+        elif operation == MARK_VISITED:
+            planet.mark_visited(node)
+    planet.journal = journal
+
+
+def open_planet(name: str, directory: str, sync: bool = False, **planet_options) -> Planet:
+    """
+        Restores the planet with the given name from its snapshot and journal (or creates an empty one)
+        and attaches a journal which records all further changes.
+        :param name: String, planet name
+        :param directory: String, folder of the snapshots and journals, created if necessary
+        :param sync: bool, see PlanetJournal
+        :param planet_options: keyword arguments for Planet()
+        :return: Planet
+        """
+    os.makedirs(directory, exist_ok=True)
+    snapshot_path = planet_file(name, directory, 'snapshot')
+    journal_path = planet_file(name, directory, 'journal')
+    if os.path.exists(snapshot_path):
+        planet, generation = load_snapshot(snapshot_path, **planet_options)
+    else:
+        planet, generation = Planet(**planet_options), 0
+    # a journal of another generation was already contained in the snapshot when the program stopped
+    if read_generation(journal_path) == generation:
+        replay_journal(planet, journal_path)
+    planet.journal = PlanetJournal(journal_path, generation, sync)
+    return planet
+
+
+def checkpoint(planet: Planet, name: str, directory: str):
+    """
+        Writes a new snapshot of planet and empties its journal.
+        :param planet: Planet, opened with open_planet
+        :param name: String, planet name
+        :param directory: String
+        :return: void
+        """
+    os.makedirs(directory, exist_ok=True)
+    journal_path = planet_file(name, directory, 'journal')
+    current = planet.journal.generation if planet.journal is not None else read_generation(journal_path)
+    generation = 0 if current is None else current + 1
+    save_snapshot(planet, planet_file(name, directory, 'snapshot'), generation)
+    if planet.journal is not None:
+        planet.journal.reset(generation)
+    else:
+        PlanetJournal(journal_path, generation).close()